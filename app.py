@@ -1,17 +1,24 @@
 import os
 import ssl
 import certifi
-import anthropic
 from dotenv import load_dotenv
 from slack_bolt import App
 from slack_sdk import WebClient
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_bolt.adapter.flask import SlackRequestHandler
 import re
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
 from flask import Flask, request
+from calendar_events import iter_events, meeting_window
+from clients import get_claude
+from briefs import get_brief, brief_to_markdown
+from follow_ups import PREFETCH_QUEUE, answer_follow_up, load_suggestions, record_stat
+from meetings_view import get_meetings_view, store_meetings_view, visible_meetings, view_is_stale, request_refresh
+from multi_research import companies_from_domains, research_meeting_companies
+from tenants import multi_workspace_enabled, get_oauth_settings, get_client_for_team, tenant_id
+import idempotency
+from slack_format import convert_markdown_to_slack, render_brief_blocks
+from json_store import load_json, save_json, locked_json
+from profiling import profiled, load_profiling_overrides, save_profiling_overrides, load_profile_index
 import threading
 import json
 from datetime import datetime, timedelta
@@ -19,11 +26,6 @@ from datetime import datetime, timedelta
 
 load_dotenv()
 
-#lets get the anthropic client
-claude = anthropic.Anthropic(
-    api_key=os.environ.get("ANTHROPIC_API_KEY")
-)
-
 # Create SSL context with certifi certificates
 ssl_context = ssl.create_default_context(cafile=certifi.where())
 
@@ -33,11 +35,20 @@ client = WebClient(
     ssl=ssl_context
 )
 
-slack_app = App(
-    token=os.environ.get("SLACK_BOT_TOKEN"),
-    signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
-    client=client
-)
+if multi_workspace_enabled():
+    # Multi-workspace: Bolt resolves a per-team token from the installation store
+    slack_app = App(
+        signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
+        oauth_settings=get_oauth_settings()
+    )
+else:
+    slack_app = App(
+        token=os.environ.get("SLACK_BOT_TOKEN"),
+        signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
+        client=client,
+        # Check the token on the first request rather than with a blocking auth.test at import
+        token_verification_enabled=False
+    )
 
 # Flask for OAuth callbacks
 flask_app = Flask(__name__)
@@ -48,21 +59,13 @@ REDIRECT_URI = os.environ.get('OAUTH_REDIRECT_URI', 'http://localhost:3000/oauth
 
 # Simple token storage (upgrade to DB later)
 def load_tokens():
-    try:
-        with open('user_tokens.json', 'r') as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    return load_json('user_tokens.json')
 
 def save_tokens(tokens):
-    with open('user_tokens.json', 'w') as f:
-        json.dump(tokens, f, indent=2)
+    save_json('user_tokens.json', tokens)
 
 # Google Calendar functions
-def get_google_auth_url(slack_user_id):
+def get_google_auth_url(slack_user_id, team_id=None):
     """Generate Google OAuth URL"""
     google_client_id = os.environ.get("GOOGLE_CLIENT_ID")
     google_client_secret = os.environ.get("GOOGLE_CLIENT_SECRET")
@@ -70,6 +73,8 @@ def get_google_auth_url(slack_user_id):
     if not google_client_id or not google_client_secret:
         raise ValueError("Google OAuth credentials not configured")
     
+    from google_auth_oauthlib.flow import Flow
+    
     flow = Flow.from_client_config(
         {
             "web": {
@@ -92,7 +97,7 @@ def get_google_auth_url(slack_user_id):
     
     # Store state with user_id for callback
     tokens = load_tokens()
-    tokens[state] = {'slack_user_id': slack_user_id}
+    tokens[state] = {'slack_user_id': slack_user_id, 'team_id': team_id}
     save_tokens(tokens)
     
     return authorization_url
@@ -111,6 +116,11 @@ def get_upcoming_meetings(slack_user_id):
     if not user_creds:
         return None
     
+    # Google client libraries are slow to import; only pay for them when we fetch
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+    from googleapiclient.discovery import build
+    
     try:
         credentials = Credentials(
             token=user_creds['token'],
@@ -135,70 +145,64 @@ def get_upcoming_meetings(slack_user_id):
         
         service = build('calendar', 'v3', credentials=credentials)
         
-        # Get events from next 24-48 hours
-        now = datetime.utcnow()
-        time_min = (now + timedelta(hours=24)).isoformat() + 'Z'
-        time_max = (now + timedelta(hours=48)).isoformat() + 'Z'
-        
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=time_min,
-            timeMax=time_max,
-            maxResults=10,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        return events_result.get('items', [])
+        # Get events from next 24-48 hours (all pages, partial response)
+        time_min, time_max = meeting_window()
+        return list(iter_events(service, time_min, time_max))
     except Exception as e:
         print(f"Error fetching calendar events: {e}")
         return None
 
 # Research function
-def research_company(company_name):
-    """Generate a simple research brief using Claude"""
-    prompt = f"""You are a sales research assistant working for OutSystems, based out of the Boston office. You are an expert Solutions Architect and deep expert on enterprise software development and agentic AI. Create a brief company overview for {company_name} that would help a sales person prepare for a meeting to sell OutSystems' platform.
-
-Include:
-- 📈What the company does
-- 📊Industry and size (estimate if needed)
-- 📰Recent news or developments
-- 💡Potential pain points a sales person should know
-
-Keep it concise - 3-4 paragraphs max.
-
-Use markdown formatting for the output."""
-
-    message = claude.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=1000,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    return message.content[0].text
+def research_company(company_name, team_id=None):
+    """Structured research brief for a company, regenerating only the stale sections"""
+    return get_brief(get_claude(), company_name, team_id)
 
 # Store active research contexts (file-based for Celery compatibility)
+RESEARCH_CONTEXTS_FILE = 'research_contexts.json'
+
 def load_research_contexts():
     """Load research contexts from file"""
-    try:
-        with open('research_contexts.json', 'r') as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    return load_json(RESEARCH_CONTEXTS_FILE)
 
 def save_research_contexts(contexts):
     """Save research contexts to file"""
-    with open('research_contexts.json', 'w') as f:
-        json.dump(contexts, f, indent=2)
+    save_json(RESEARCH_CONTEXTS_FILE, contexts)
+
+# In-memory cache, filled from the file on first lookup of each thread
+research_contexts = {}
 
-# In-memory cache (synced with file)
-research_contexts = load_research_contexts()
+def save_research_context(context_key, context):
+    """Cache a thread's context and merge it into the shared file"""
+    research_contexts[context_key] = context
+    # Locked re-read so contexts written by the workers aren't overwritten
+    with locked_json(RESEARCH_CONTEXTS_FILE) as contexts:
+        contexts[context_key] = context
+
+def get_research_context(context_key):
+    """Look up a thread's context, picking up contexts the workers wrote since startup"""
+    if context_key not in research_contexts:
+        stored = load_research_contexts().get(context_key)
+        if stored:
+            research_contexts[context_key] = stored
+    return research_contexts.get(context_key)
+
+def queue_follow_up_prefetch(context_key, context, channel_id, thread_ts, team_id=None):
+    """Kick off low-priority speculative answers for a freshly posted brief"""
+    from tasks import prefetch_follow_ups
+    
+    try:
+        prefetch_follow_ups.apply_async(
+            args=[context_key, context['company'], context['research_brief'],
+                  context.get('meeting_summary', 'N/A'), channel_id, thread_ts],
+            kwargs={'team_id': team_id},
+            queue=PREFETCH_QUEUE
+        )
+    except Exception as e:
+        print(f"⚠️ Couldn't queue follow-up prefetch: {e}")
 
 @slack_app.event("message")
-def handle_message_events(event, say, client):
+@profiled
+def handle_message_events(event, say, client, body):
     """Handle all messages, including threaded replies"""
     
     # Ignore bot's own messages
@@ -213,10 +217,13 @@ def handle_message_events(event, say, client):
     # Check if this thread has an active research context
     context_key = f"{event['channel']}_{thread_ts}"
     
-    if context_key not in research_contexts:
+    context = get_research_context(context_key)
+    if not context:
         return
     
-    context = research_contexts[context_key]
+    # Slack redelivers slow events - answer each question once
+    if not idempotency.claim_event(body.get('event_id'), event.get('client_msg_id'), scope='message'):
+        return
     
     # Check if context has expired (48 hours)
     created_at = datetime.fromisoformat(context['created_at'])
@@ -243,40 +250,7 @@ def handle_message_events(event, say, client):
     try:
         conversation_history = context.get('conversation', [])
         
-        # Build prompt with original research + conversation history
-        messages = [
-            {
-                "role": "user",
-                "content": f"""You are a sales research assistant. Here's the research brief you provided earlier:
-
-{context['research_brief']}
-
-Company: {context['company']}
-Meeting: {context.get('meeting_summary', 'N/A')}
-
-Now the user has a follow-up question. Answer it based on the research context and your knowledge."""
-            },
-            {
-                "role": "assistant",
-                "content": "I'll answer your follow-up questions based on the research."
-            }
-        ]
-        
-        # Add conversation history
-        for msg in conversation_history:
-            messages.append({"role": msg["role"], "content": msg["content"]})
-        
-        # Add current question
-        messages.append({"role": "user", "content": user_question})
-        
-        # Call Claude
-        response = claude.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1000,
-            messages=messages
-        )
-        
-        answer = response.content[0].text
+        answer, _ = answer_follow_up(get_claude(), context, user_question)
         
         # Convert markdown and send response in thread
         formatted_answer = convert_markdown_to_slack(answer)
@@ -303,51 +277,31 @@ Now the user has a follow-up question. Answer it based on the research context a
             text=f"❌ Sorry, I couldn't answer that: {str(e)}"
         )
 
-# Markdown conversion helper
-def convert_markdown_to_slack(text):
-    """Convert common markdown to Slack's mrkdwn format"""
-    # Split into lines for better processing
-    lines = text.split('\n')
-    result_lines = []
-    
-    for line in lines:
-        # Convert headers to bold (handle with/without leading spaces and emojis)
-        if re.match(r'^\s*###\s+(.+)$', line):
-            line = re.sub(r'^\s*###\s+(.+)$', r'*\1*', line)
-        elif re.match(r'^\s*##\s+(.+)$', line):
-            line = re.sub(r'^\s*##\s+(.+)$', r'*\1*', line)
-        elif re.match(r'^\s*#\s+(.+)$', line):
-            line = re.sub(r'^\s*#\s+(.+)$', r'*\1*', line)
-        else:
-            # Convert markdown bold **text** to Slack *text* (but not if already in a header)
-            # Handle bold text that might span multiple words
-            line = re.sub(r'\*\*([^*\n]+?)\*\*', r'*\1*', line)
-            
-            # Convert markdown links [text](url) to Slack format <url|text>
-            line = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<\2|\1>', line)
-            
-            # Ensure bullet points use Slack format (•)
-            line = re.sub(r'^[\-\*]\s+', '• ', line)
-            
-            # Convert numbered lists to Slack format
-            line = re.sub(r'^\d+\.\s+', '• ', line)
-        
-        result_lines.append(line)
-    
-    return '\n'.join(result_lines)
-
-
 @slack_app.action("proactive_research")
+@profiled
 def handle_proactive_research(ack, body, client):
     ack()
     
-    from tasks import trigger_research_with_context
+    import fair_queue
     
     value = json.loads(body['actions'][0]['value'])
-    company = value['company']
+    # Older notifications only carry a single company
+    companies = value.get('companies') or [value['company']]
+    company = ', '.join(companies)
     meeting_summary = value['summary']
     slack_user_id = body['user']['id']
     channel_id = body['channel']['id']
+    team_id = body.get('team', {}).get('id')
+    
+    # Extra clicks attach to the research already running
+    claimed, existing = idempotency.begin_research(slack_user_id, company)
+    if not claimed:
+        client.chat_postMessage(
+            channel=slack_user_id,
+            thread_ts=existing.get('thread_ts'),
+            text=idempotency.duplicate_research_message(company, existing)
+        )
+        return
     
     # Send initial message
     result = client.chat_postMessage(
@@ -356,16 +310,71 @@ def handle_proactive_research(ack, body, client):
     )
     
     thread_ts = result['ts']
-    
-    # Trigger background research with thread context
-    trigger_research_with_context.delay(
-        company, 
-        slack_user_id, 
-        meeting_summary,
-        channel_id,
-        thread_ts
+    idempotency.update_research(slack_user_id, company, thread_ts=thread_ts)
+    
+    # Queue background research with thread context, fairly across workspaces
+    fair_queue.enqueue(
+        tenant_id(team_id),
+        'tasks.trigger_research_with_context',
+        [companies, slack_user_id, meeting_summary, channel_id, thread_ts],
+        {'team_id': team_id}
     )
 
+@slack_app.action(re.compile(r"^follow_up_question_\d+$"))
+@profiled
+def handle_follow_up_question(ack, body, client):
+    ack()
+    
+    value = json.loads(body['actions'][0]['value'])
+    context_key = value['context_key']
+    channel_id = body['channel']['id']
+    thread_ts = body['message'].get('thread_ts') or body['message']['ts']
+    
+    context = get_research_context(context_key)
+    suggestions = load_suggestions(context_key)
+    if not context or value['index'] >= len(suggestions):
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text="⏰ This research thread has expired. Run a new research to ask more questions!"
+        )
+        return
+    
+    suggestion = suggestions[value['index']]
+    question = suggestion['question']
+    answer = suggestion.get('answer')
+    record_stat('clicks')
+    
+    try:
+        if answer:
+            record_stat('hits')
+        else:
+            # Prefetch hasn't got to this one yet - answer it live
+            record_stat('misses')
+            answer, _ = answer_follow_up(get_claude(), context, question)
+        
+        formatted_answer = convert_markdown_to_slack(answer)
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"*{question}*\n\n{formatted_answer}",
+            mrkdwn=True
+        )
+        
+        # Seed the thread so typed follow-ups build on this answer
+        conversation_history = context.get('conversation', [])
+        conversation_history.append({"role": "user", "content": question})
+        conversation_history.append({"role": "assistant", "content": answer})
+        context['conversation'] = conversation_history
+        research_contexts[context_key] = context
+    except Exception as e:
+        print(f"❌ Error answering suggested question: {e}")
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"❌ Sorry, I couldn't answer that: {str(e)}"
+        )
+
 @slack_app.action("skip_research")
 def handle_skip_research(ack, say):
     ack()
@@ -373,6 +382,7 @@ def handle_skip_research(ack, say):
 
 # Slack commands
 @slack_app.command("/research")
+@profiled
 def handle_research_command(ack, say, command, client):
     print("🎯 /research command received!")
     ack()
@@ -383,16 +393,25 @@ def handle_research_command(ack, say, command, client):
         say("Please provide a company name: `/research Acme Corp`")
         return
     
+    slack_user_id = command['user_id']
+    claimed, existing = idempotency.begin_research(slack_user_id, company)
+    if not claimed:
+        say(idempotency.duplicate_research_message(company, existing))
+        return
+    
     # Send initial message
     say(f"🔍 Researching {company}... this will take ~30 seconds")
     
+    team_id = command.get('team_id')
     try:
-        brief = research_company(company)
+        brief_data = research_company(company, team_id)
+        brief = brief_to_markdown(brief_data)
         
         # Convert markdown and post research in thread
         formatted_brief = convert_markdown_to_slack(brief)
         result = client.chat_postMessage(
             channel=command['channel_id'],
+            blocks=render_brief_blocks([brief_data], f"Research Brief: {company}", footer="💬 Ask me follow-up questions in this thread! (Available for 48 hours)"),
             text=f"*Research Brief: {company}*\n\n{formatted_brief}\n\n_💬 Ask me follow-up questions in this thread! (Available for 48 hours)_",
             mrkdwn=True
         )
@@ -400,18 +419,20 @@ def handle_research_command(ack, say, command, client):
         # Store context for follow-up questions
         thread_ts = result['ts']
         context_key = f"{command['channel_id']}_{thread_ts}"
-        research_contexts[context_key] = {
+        save_research_context(context_key, {
             'company': company,
             'research_brief': brief,
             'created_at': datetime.utcnow().isoformat(),
             'conversation': []
-        }
-        save_research_contexts(research_contexts)
+        })
+        idempotency.update_research(slack_user_id, company, status='done', thread_ts=thread_ts)
+        queue_follow_up_prefetch(context_key, research_contexts[context_key], command['channel_id'], thread_ts, team_id)
         
         print(f"✅ Created research context: {context_key}")
         
     except Exception as e:
         print(f"❌ Error: {str(e)}")
+        idempotency.release_research(slack_user_id, company)
         say(f"❌ Sorry, something went wrong: {str(e)}")
 
 @slack_app.command("/connect-calendar")
@@ -429,7 +450,7 @@ def handle_connect_calendar(ack, say, command):
             return
         
         slack_user_id = command['user_id']
-        auth_url = get_google_auth_url(slack_user_id)
+        auth_url = get_google_auth_url(slack_user_id, command.get('team_id'))
         
         say(f"📅 Click here to connect your Google Calendar:\n{auth_url}\n\nI'll be able to see your upcoming meetings and proactively research attendees!")
     except Exception as e:
@@ -438,23 +459,18 @@ def handle_connect_calendar(ack, say, command):
         traceback.print_exc()
         say(f"❌ Sorry, something went wrong connecting your calendar: {str(e)}")
 
-@slack_app.command("/upcoming-meetings")
-def handle_upcoming_meetings(ack, say, command):
-    print("📅 /upcoming-meetings command received!")
-    ack()
-    
-    slack_user_id = command['user_id']
-    meetings = get_upcoming_meetings(slack_user_id)
-    
-    if meetings is None:
-        say("❌ You haven't connected your calendar yet. Use `/connect-calendar` first!")
-        return
-    
-    if not meetings:
-        say("No meetings found in the next 24-48 hours.")
-        return
+# Slack allows 50 blocks per message; each meeting takes two
+MAX_MEETINGS_SHOWN = 20
+
+def build_upcoming_meetings_blocks(view, refreshing=False):
+    """Render a stored meetings view as Block Kit with research + refresh buttons"""
+    meetings = visible_meetings(view)
+    refreshed_at = datetime.fromisoformat(view['refreshed_at'])
+    age_minutes = int((datetime.utcnow() - refreshed_at).total_seconds() // 60)
+    updated = f"Updated {age_minutes} min ago" if age_minutes else "Updated just now"
+    if refreshing:
+        updated += " · checking your calendar again in the background"
     
-    # Build message with interactive buttons
     blocks = [
         {
             "type": "header",
@@ -462,27 +478,28 @@ def handle_upcoming_meetings(ack, say, command):
                 "type": "plain_text",
                 "text": "📅 Your upcoming meetings (next 24-48 hours):"
             }
+        },
+        {
+            "type": "context",
+            "elements": [{
+                "type": "mrkdwn",
+                "text": updated
+            }]
         }
     ]
     
-    for i, event in enumerate(meetings):
-        start = event['start'].get('dateTime', event['start'].get('date'))
-        summary = event.get('summary', 'No title')
-        attendees = event.get('attendees', [])
-        
-        # Extract external attendee domains (potential companies)
-        external_domains = set()
-        for attendee in attendees:
-            email = attendee.get('email', '')
-            if '@' in email and 'gmail.com' not in email:
-                domain = email.split('@')[1]
-                external_domains.add(domain)
-        
-        meeting_text = f"*{summary}*\n{start}"
-        if attendees:
-            meeting_text += f"\n{len(attendees)} attendees"
-        if external_domains:
-            meeting_text += f"\n Companies: {', '.join(external_domains)}"
+    if not meetings:
+        blocks.append({
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "No meetings found in the next 24-48 hours."}
+        })
+    
+    for i, meeting in enumerate(meetings[:MAX_MEETINGS_SHOWN]):
+        meeting_text = f"*{meeting['summary']}*\n{meeting['start']}"
+        if meeting['attendee_count']:
+            meeting_text += f"\n{meeting['attendee_count']} attendees"
+        if meeting['companies']:
+            meeting_text += f"\n Companies: {', '.join(meeting['companies'])}"
         
         blocks.append({
             "type": "section",
@@ -497,16 +514,109 @@ def handle_upcoming_meetings(ack, say, command):
                     "text": "🔍 Research"
                 },
                 "value": json.dumps({
-                    "meeting_id": event.get('id'),
-                    "summary": summary,
-                    "domains": list(external_domains)
+                    "meeting_id": meeting['id'],
+                    "summary": meeting['summary'],
+                    "domains": meeting['domains']
                 }),
                 "action_id": f"research_meeting_{i}"
             }
         })
         blocks.append({"type": "divider"})
     
-    say(blocks=blocks, text="Your upcoming meetings")
+    if len(meetings) > MAX_MEETINGS_SHOWN:
+        blocks.append({
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": f"…and {len(meetings) - MAX_MEETINGS_SHOWN} more"}]
+        })
+    
+    blocks.append({
+        "type": "actions",
+        "elements": [{
+            "type": "button",
+            "text": {"type": "plain_text", "text": "🔄 Refresh"},
+            "action_id": "refresh_upcoming_meetings"
+        }]
+    })
+    return blocks
+
+@slack_app.command("/upcoming-meetings")
+@profiled
+def handle_upcoming_meetings(ack, say, command):
+    print("📅 /upcoming-meetings command received!")
+    ack()
+    
+    slack_user_id = command['user_id']
+    # Served from the view the background scans keep up to date
+    view = get_meetings_view(slack_user_id)
+    
+    if view is None:
+        # Never scanned yet - fetch once live and seed the view
+        meetings = get_upcoming_meetings(slack_user_id)
+        if meetings is None:
+            say("❌ You haven't connected your calendar yet. Use `/connect-calendar` first!")
+            return
+        view = store_meetings_view(slack_user_id, meetings)
+    
+    # Idle users are scanned rarely, so an old view queues a scan for next time
+    refreshing = view_is_stale(view) and request_refresh(slack_user_id, command.get('team_id'))
+    say(blocks=build_upcoming_meetings_blocks(view, refreshing), text="Your upcoming meetings")
+
+@slack_app.action("refresh_upcoming_meetings")
+def handle_refresh_upcoming_meetings(ack, body, respond):
+    ack()
+    
+    slack_user_id = body['user']['id']
+    # ack() has already gone back to Slack, so the live fetch is off the interaction budget
+    meetings = get_upcoming_meetings(slack_user_id)
+    if meetings is None:
+        respond(text="❌ Couldn't refresh your calendar. Try `/connect-calendar` again.", replace_original=False)
+        return
+    
+    view = store_meetings_view(slack_user_id, meetings)
+    respond(blocks=build_upcoming_meetings_blocks(view), text="Your upcoming meetings", replace_original=True)
+
+@slack_app.command("/profile")
+def handle_profile_command(ack, say, command):
+    """Admin-only: /profile status | on <target|*> [rate] | off <target|*> | recent"""
+    ack()
+    
+    admin_ids = [u.strip() for u in os.environ.get('PROFILE_ADMIN_USER_IDS', '').split(',') if u.strip()]
+    if command['user_id'] not in admin_ids:
+        say("❌ Only admins can change profiling settings.")
+        return
+    
+    parts = command['text'].split()
+    action = parts[0].lower() if parts else 'status'
+    overrides = dict(load_profiling_overrides())
+    
+    if action == 'on' and len(parts) >= 2:
+        try:
+            rate = float(parts[2]) if len(parts) > 2 else 1.0
+        except ValueError:
+            say("Sample rate must be a number between 0 and 1: `/profile on handle_research_command 0.25`")
+            return
+        overrides[parts[1]] = max(0.0, min(1.0, rate))
+        save_profiling_overrides(overrides)
+        say(f"🔬 Profiling `{parts[1]}` at {overrides[parts[1]]:.0%} sample rate")
+    elif action == 'off' and len(parts) >= 2:
+        overrides[parts[1]] = 0.0
+        save_profiling_overrides(overrides)
+        say(f"🔬 Profiling off for `{parts[1]}`")
+    elif action == 'recent':
+        index = load_profile_index()[-5:]
+        if not index:
+            say("No slow profiles captured yet.")
+            return
+        lines = []
+        for entry in reversed(index):
+            top = entry['top'][0]['function'] if entry['top'] else 'n/a'
+            lines.append(f"• `{entry['target']}` {entry['wall_time']}s at {entry['captured_at']} - top: `{top}` ({entry['file']})")
+        say("🐢 Recent slow profiles:\n" + "\n".join(lines))
+    else:
+        if not overrides:
+            say("🔬 No runtime profiling overrides (env `PROFILE_TARGETS` still applies).")
+            return
+        say("🔬 Profiling overrides:\n" + "\n".join(f"• `{target}`: {rate:.0%}" for target, rate in overrides.items()))
 
 @slack_app.message(re.compile(r"^(hello|hi|hey)$", re.IGNORECASE))
 def say_hello(message, say):
@@ -516,11 +626,15 @@ def say_hello(message, say):
 
 # Handle bot mentions
 @slack_app.event("app_mention")
-def handle_mention(event, say):
+@profiled
+def handle_mention(event, say, body):
     """Handle bot mentions - research company or show help"""
     text = event.get('text', '').strip()
     user = event.get('user')
     
+    if not idempotency.claim_event(body.get('event_id'), event.get('client_msg_id'), scope='mention'):
+        return
+    
     print(f"📢 Bot mentioned by user {user}: {text}")
     
     # Remove bot mention
@@ -540,15 +654,28 @@ def handle_mention(event, say):
     
     # Otherwise, treat as company name
     company = text.strip()
+    claimed, existing = idempotency.begin_research(user, company)
+    if not claimed:
+        say(idempotency.duplicate_research_message(company, existing))
+        return
+    
     say(f"🔍 Researching {company}... this will take ~30-60 seconds")
     
+    team_id = body.get('team_id')
     try:
-        brief = research_company(company)
+        brief_data = research_company(company, team_id)
+        brief = brief_to_markdown(brief_data)
         # Convert markdown and send with mrkdwn enabled
         formatted_brief = convert_markdown_to_slack(brief)
-        say(f"*Research Brief: {company}*\n\n{formatted_brief}", mrkdwn=True)
+        say(
+            blocks=render_brief_blocks([brief_data], f"Research Brief: {company}"),
+            text=f"*Research Brief: {company}*\n\n{formatted_brief}",
+            mrkdwn=True
+        )
+        idempotency.update_research(user, company, status='done')
     except Exception as e:
         print(f"❌ Error: {str(e)}")
+        idempotency.release_research(user, company)
         say(f"❌ Sorry, something went wrong: {str(e)}")
 
 # Flask OAuth callback
@@ -564,6 +691,8 @@ def oauth_callback():
     
     slack_user_id = tokens[state]['slack_user_id']
     
+    from google_auth_oauthlib.flow import Flow
+    
     # Exchange code for tokens
     flow = Flow.from_client_config(
         {
@@ -597,10 +726,11 @@ def oauth_callback():
     # Notify user in Slack via DM
     try:
         # Open DM conversation with user
-        conversation = slack_app.client.conversations_open(users=[slack_user_id])
+        slack_client = get_client_for_team(tokens[state].get('team_id'))
+        conversation = slack_client.conversations_open(users=[slack_user_id])
         channel_id = conversation['channel']['id']
         
-        slack_app.client.chat_postMessage(
+        slack_client.chat_postMessage(
             channel=channel_id,
             text="✅ Calendar connected! I can now see your upcoming meetings. Use `/upcoming-meetings` to test it out."
         )
@@ -609,18 +739,30 @@ def oauth_callback():
     
     return "✅ Calendar connected! You can close this window and return to Slack."
 
+# Slack OAuth install flow (multi-workspace mode only)
+slack_handler = SlackRequestHandler(slack_app)
+
+@flask_app.route('/slack/install')
+def slack_install():
+    if not multi_workspace_enabled():
+        return "Multi-workspace installs are not configured", 404
+    return slack_handler.handle(request)
+
+@flask_app.route('/slack/oauth_redirect')
+def slack_oauth_redirect():
+    if not multi_workspace_enabled():
+        return "Multi-workspace installs are not configured", 404
+    return slack_handler.handle(request)
+
 # Run both Flask and Slack bot
 def run_flask():
     port = int(os.environ.get('PORT', 3000))
     flask_app.run(host='0.0.0.0', port=port)
 
 
-@slack_app.action("research_meeting_0")
-@slack_app.action("research_meeting_1")
-@slack_app.action("research_meeting_2")
-@slack_app.action("research_meeting_3")
-@slack_app.action("research_meeting_4")
-def handle_research_button(ack, body, say):
+@slack_app.action(re.compile(r"^research_meeting_\d+$"))
+@profiled
+def handle_research_button(ack, body, say, client):
     ack()
     
     value = json.loads(body['actions'][0]['value'])
@@ -631,18 +773,61 @@ def handle_research_button(ack, body, say):
         say(f"❌ Couldn't find a company to research for '{meeting_summary}'. Try `/research Company Name` manually.")
         return
     
-    # Research the first company found
-    company = domains[0].replace('.com', '').replace('.', ' ').title()
+    # Research every external company in the meeting
+    companies = companies_from_domains(domains)
+    company_list = ', '.join(companies)
+    channel_id = body['channel']['id']
+    slack_user_id = body['user']['id']
+    
+    claimed, existing = idempotency.begin_research(slack_user_id, company_list)
+    if not claimed:
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=existing.get('thread_ts'),
+            text=idempotency.duplicate_research_message(company_list, existing)
+        )
+        return
     
-    say(f"🔍 Researching {company} for your meeting: *{meeting_summary}*...")
+    result = client.chat_postMessage(
+        channel=channel_id,
+        text=f"🔍 Researching {company_list} for your meeting: *{meeting_summary}*..."
+    )
+    thread_ts = result['ts']
+    idempotency.update_research(slack_user_id, company_list, thread_ts=thread_ts)
     
+    team_id = body.get('team', {}).get('id')
     try:
-        brief = research_company(company)
+        brief, summary, briefs, failed = research_meeting_companies(
+            companies, lambda company: research_company(company, team_id), get_claude()
+        )
         # Convert markdown and send with mrkdwn enabled
         formatted_brief = convert_markdown_to_slack(brief)
-        say(f"*Research Brief: {company}*\n\n{formatted_brief}\n\n_Ask me follow-up questions in this thread!_", mrkdwn=True)
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            blocks=render_brief_blocks(briefs, f"Research Brief: {company_list}", summary, footer="💬 Ask me follow-up questions in this thread! (Available for 48 hours)", failed=failed),
+            text=f"*Research Brief: {company_list}*\n\n{formatted_brief}\n\n_💬 Ask me follow-up questions in this thread! (Available for 48 hours)_",
+            mrkdwn=True
+        )
+        
+        # Store context for follow-up questions
+        context_key = f"{channel_id}_{thread_ts}"
+        save_research_context(context_key, {
+            'company': company_list,
+            'research_brief': brief,
+            'created_at': datetime.utcnow().isoformat(),
+            'conversation': [],
+            'meeting_summary': meeting_summary
+        })
+        idempotency.update_research(slack_user_id, company_list, status='done')
+        queue_follow_up_prefetch(context_key, research_contexts[context_key], channel_id, thread_ts, team_id)
     except Exception as e:
-        say(f"❌ Sorry, something went wrong: {str(e)}")
+        idempotency.release_research(slack_user_id, company_list)
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"❌ Sorry, something went wrong: {str(e)}"
+        )
 
 if __name__ == "__main__":
     print("⚡️ Bot is running in Socket Mode!")
@@ -0,0 +1,156 @@
+import os
+import socket
+import uuid
+from datetime import datetime
+import redis
+from celery.beat import Scheduler
+from fair_queue import get_redis
+
+
+# Celery beat scheduler that any number of nodes can run at once.
+#
+# Nodes compete for a leader lease in Redis (SET NX with a TTL). Each new lease
+# gets a fencing token from an ever-increasing counter, and the lease value is
+# "<node>:<token>". Only the leader dispatches, and every dispatch first claims
+# the entry's run in a Lua script that checks the caller still holds that exact
+# lease and compare-and-sets the entry's last run time - so a leader that stalled
+# past its lease, or two nodes racing on the same tick, can't both send a task.
+# Last-run times live in Redis rather than a local celerybeat-schedule.db, so a
+# node taking over picks up exactly where the old leader stopped. Followers poll
+# every BEAT_POLL_SECONDS, so a dead leader is replaced within the lease TTL.
+BEAT_LEASE_SECONDS = float(os.environ.get('BEAT_LEASE_SECONDS', 10))
+BEAT_POLL_SECONDS = float(os.environ.get('BEAT_POLL_SECONDS', 1))
+
+KEY_PREFIX = 'beat'
+LEADER_KEY = f'{KEY_PREFIX}:leader'
+FENCE_KEY = f'{KEY_PREFIX}:fence'
+LAST_RUN_KEY = f'{KEY_PREFIX}:last_run'
+
+# Returns the new fencing token, or nil if someone else holds the lease
+ACQUIRE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return nil end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. token, 'PX', ARGV[2])
+return token
+"""
+
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+return redis.call('DEL', KEYS[1])
+"""
+
+# -1: lease lost, 0: another dispatch already claimed this run, 1: claimed
+CLAIM_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return -1 end
+local current = redis.call('HGET', KEYS[2], ARGV[2]) or ''
+if current ~= ARGV[3] then return 0 end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[4])
+return 1
+"""
+
+
+class LeaseScheduler(Scheduler):
+    """Beat scheduler backed by Redis with a leader lease and fenced dispatch"""
+
+    def __init__(self, app, max_interval=None, **kwargs):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease = None
+        r = get_redis()
+        self._acquire = r.register_script(ACQUIRE_SCRIPT)
+        self._renew = r.register_script(RENEW_SCRIPT)
+        self._release = r.register_script(RELEASE_SCRIPT)
+        self._claim = r.register_script(CLAIM_SCRIPT)
+        super().__init__(app, max_interval=max_interval or BEAT_POLL_SECONDS, **kwargs)
+
+    def hold_lease(self):
+        """Renew our lease, or try to take it over; True if this node is the leader"""
+        ttl_ms = int(BEAT_LEASE_SECONDS * 1000)
+        try:
+            if self.lease and self._renew(keys=[LEADER_KEY], args=[self.lease, ttl_ms]):
+                return True
+            if self.lease:
+                print(f"⚠️ Beat lease {self.lease} lost, standing by")
+                self.lease = None
+            token = self._acquire(keys=[LEADER_KEY, FENCE_KEY], args=[self.node_id, ttl_ms])
+        except redis.RedisError as e:
+            # Without Redis we can't prove we're the only leader, so don't dispatch
+            print(f"⚠️ Beat lease store unavailable, not dispatching: {e}")
+            self.lease = None
+            return False
+        if token is None:
+            return False
+        self.lease = f"{self.node_id}:{token}"
+        print(f"👑 Beat leader is now {self.node_id} (fencing token {token})")
+        return True
+
+    def claim_run(self, entry, expected, last_run_at):
+        """Atomically record this run if we still hold the lease and nobody ran it first"""
+        return self._claim(
+            keys=[LEADER_KEY, LAST_RUN_KEY],
+            args=[self.lease, entry.name, expected, last_run_at.isoformat()]
+        )
+
+    def tick(self, *args, **kwargs):
+        if not self.hold_lease():
+            return self.max_interval
+
+        try:
+            last_runs = get_redis().hgetall(LAST_RUN_KEY)
+        except redis.RedisError as e:
+            print(f"⚠️ Couldn't read beat state: {e}")
+            return self.max_interval
+
+        next_wake = self.max_interval
+        for name, entry in list(self.schedule.items()):
+            stored = last_runs.get(name, '')
+            if stored:
+                entry.last_run_at = datetime.fromisoformat(stored)
+            is_due, next_in = self.is_due(entry)
+            if is_due:
+                new_entry = next(entry)
+                try:
+                    claimed = self.claim_run(entry, stored, new_entry.last_run_at)
+                except redis.RedisError as e:
+                    print(f"⚠️ Couldn't claim {name}, skipping this tick: {e}")
+                    return self.max_interval
+                if claimed == -1:
+                    print(f"⚠️ Beat lease {self.lease} lost before dispatching {name}")
+                    self.lease = None
+                    return self.max_interval
+                if claimed == 1:
+                    self.apply_entry(entry, producer=self.producer)
+                self.schedule[name] = new_entry
+                next_in = new_entry.is_due()[1]
+            next_wake = min(next_wake, next_in)
+        return next_wake
+
+    def close(self):
+        # Hand over right away on a clean shutdown instead of waiting for the TTL
+        if self.lease:
+            try:
+                self._release(keys=[LEADER_KEY], args=[self.lease])
+                print(f"👋 Released beat lease {self.lease}")
+            except redis.RedisError:
+                pass
+            self.lease = None
+        super().close()
+
+    @property
+    def info(self):
+        return f'    . lease -> {LEADER_KEY} ({BEAT_LEASE_SECONDS:g}s TTL, node {self.node_id})'
+
+
+def beat_status():
+    """Current leader, latest fencing token and last run of each schedule entry"""
+    r = get_redis()
+    return {
+        'leader': r.get(LEADER_KEY),
+        'fencing_token': int(r.get(FENCE_KEY) or 0),
+        'last_run': r.hgetall(LAST_RUN_KEY)
+    }
@@ -0,0 +1,107 @@
+"""Compare real `celery worker -P prefork` and `-P gevent` on the same research-shaped job.
+
+Starts one Celery worker per pool at the same --concurrency against Redis
+(REDIS_URL), sends --jobs simulated research jobs (see worker_pools.py) and
+reports wall time, throughput and the worker's total RSS including its child
+processes. Uses its own queue and keys, so it won't touch the bot's work,
+but needs a Redis server and gevent installed.
+
+    python benchmarks/celery_pools.py
+    python benchmarks/celery_pools.py --jobs 400 --concurrency 100 --claude-seconds 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import redis
+from celery import Celery
+from worker_pools import research_job
+
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+QUEUE = 'bench_pools'
+DONE_KEY = 'bench_pools:done'
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+app = Celery('celery_pools', broker=REDIS_URL)
+
+
+@app.task(name='bench_pools.research_job')
+def research_task(claude_seconds):
+    research_job(claude_seconds)
+    redis.Redis.from_url(REDIS_URL).incr(DONE_KEY)
+
+
+def worker_rss_mb(pid):
+    """RSS of the worker and its pool processes (Linux/macOS ps)"""
+    out = subprocess.run(['ps', '-A', '-o', 'pid=,ppid=,rss='], capture_output=True, text=True).stdout
+    total_kb = 0
+    for line in out.splitlines():
+        proc, parent, rss = (int(x) for x in line.split())
+        if pid in (proc, parent):
+            total_kb += rss
+    return total_kb / 1024
+
+
+def wait_for(r, count, timeout):
+    deadline = time.time() + timeout
+    while int(r.get(DONE_KEY) or 0) < count:
+        if time.time() > deadline:
+            raise RuntimeError(f"only {r.get(DONE_KEY) or 0}/{count} jobs finished in {timeout}s")
+        time.sleep(0.05)
+
+
+def run_pool(pool, jobs, concurrency, claude_seconds):
+    r = redis.Redis.from_url(REDIS_URL)
+    r.delete(QUEUE, DONE_KEY)
+    worker = subprocess.Popen(
+        [sys.executable, '-m', 'celery', '-A', 'celery_pools', 'worker', '-P', pool,
+         '-c', str(concurrency), '-Q', QUEUE, '--loglevel=warning',
+         '--without-gossip', '--without-mingle', '--without-heartbeat'],
+        cwd=BENCH_DIR
+    )
+    try:
+        # Warm-up job so worker boot time isn't counted
+        research_task.apply_async((0,), queue=QUEUE)
+        wait_for(r, 1, timeout=60)
+        r.delete(DONE_KEY)
+
+        started = time.perf_counter()
+        for _ in range(jobs):
+            research_task.apply_async((claude_seconds,), queue=QUEUE)
+        wait_for(r, jobs, timeout=max(60, jobs * (claude_seconds + 0.15)))
+        wall = time.perf_counter() - started
+        rss = worker_rss_mb(worker.pid)
+    finally:
+        worker.terminate()
+        worker.wait()
+        r.delete(QUEUE, DONE_KEY)
+
+    return {
+        'mode': f'celery -P {pool}',
+        'concurrency': concurrency,
+        'jobs': jobs,
+        'wall_seconds': round(wall, 2),
+        'jobs_per_second': round(jobs / wall, 2),
+        'rss_mb_total': round(rss, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pools', nargs='+', default=['prefork', 'gevent'])
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--claude-seconds', type=float, default=1.0)
+    parser.add_argument('--concurrency', type=int, default=50, help='pool size for every pool')
+    args = parser.parse_args()
+
+    for pool in args.pools:
+        try:
+            print(json.dumps(run_pool(pool, args.jobs, args.concurrency, args.claude_seconds)))
+        except (RuntimeError, redis.RedisError) as e:
+            print(f"❌ {pool} run failed: {e}")
+
+
+if __name__ == '__main__':
+    main()
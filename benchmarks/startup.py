@@ -0,0 +1,83 @@
+"""Measure bot and worker startup: import time, RSS after import, time to first handled event.
+
+Each target is imported in a fresh interpreter with placeholder credentials, so
+nothing here talks to Slack, Google, Anthropic or Redis.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter
+PROBE = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter()
+
+first_event_ms = None
+if sys.argv[1] == 'app':
+    # A listener that needs no network, called the way Bolt would call it
+    replies = []
+    module.say_hello({'user': 'U000BENCH', 'text': 'hi'}, replies.append)
+    first_event_ms = round((time.perf_counter() - started) * 1000, 1)
+
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'import_ms': round((imported - started) * 1000, 1),
+    'rss_mb': round(rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024, 1),
+    'first_event_ms': first_event_ms,
+    'modules_loaded': len(sys.modules),
+    'anthropic_loaded': 'anthropic' in sys.modules,
+    'googleapiclient_loaded': 'googleapiclient' in sys.modules,
+}))
+'''
+
+PLACEHOLDER_ENV = {
+    'SLACK_BOT_TOKEN': 'xoxb-benchmark',
+    'SLACK_SIGNING_SECRET': 'benchmark',
+    'ANTHROPIC_API_KEY': 'sk-ant-benchmark',
+}
+
+
+def measure(target):
+    env = dict(os.environ, **{k: os.environ.get(k, v) for k, v in PLACEHOLDER_ENV.items()})
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, target],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--targets', nargs='+', default=['app', 'tasks'])
+    args = parser.parse_args()
+
+    for target in args.targets:
+        try:
+            runs = [measure(target) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"❌ {target}: {e}")
+            continue
+        summary = dict(runs[-1])
+        summary['target'] = target
+        summary['runs'] = args.runs
+        summary['import_ms'] = statistics.median(r['import_ms'] for r in runs)
+        if summary['first_event_ms'] is not None:
+            summary['first_event_ms'] = statistics.median(r['first_event_ms'] for r in runs)
+        print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
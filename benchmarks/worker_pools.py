@@ -0,0 +1,106 @@
+"""Compare prefork vs gevent worker pools on I/O-bound research-shaped jobs.
+
+Each job mimics trigger_research_with_context: a Slack call, a long Claude
+call, then two more Slack calls, all waiting on the network. Nothing here
+talks to Redis, Slack or Anthropic - waits are simulated with time.sleep,
+which gevent patches the same way it patches sockets.
+
+Both pools run at the same --concurrency, so the comparison is what each
+concurrent job costs (processes vs green threads), not pool size. For real
+`celery worker -P prefork|gevent` runs against Redis, see celery_pools.py.
+
+    python benchmarks/worker_pools.py                 # both modes
+    python benchmarks/worker_pools.py --jobs 400 --concurrency 100 --claude-seconds 2
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+def rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def research_job(claude_seconds):
+    time.sleep(0.05)            # conversations_open
+    time.sleep(claude_seconds)  # messages.create
+    time.sleep(0.05)            # chat_postMessage
+    time.sleep(0.05)            # follow-up prefetch enqueue
+    return True
+
+
+def run_prefork(jobs, concurrency, claude_seconds):
+    from multiprocessing import Pool
+
+    started = time.perf_counter()
+    with Pool(processes=concurrency) as pool:
+        pool.map(research_job, [claude_seconds] * jobs, chunksize=1)
+    wall = time.perf_counter() - started
+    per_process = rss_mb(resource.RUSAGE_CHILDREN)
+    return {
+        'mode': 'prefork',
+        'processes': concurrency,
+        'concurrency': concurrency,
+        'jobs': jobs,
+        'wall_seconds': round(wall, 2),
+        'jobs_per_second': round(jobs / wall, 2),
+        'rss_mb_per_process': round(per_process, 1),
+        'rss_mb_total_estimate': round(per_process * concurrency + rss_mb(), 1)
+    }
+
+
+def run_gevent(jobs, concurrency, claude_seconds):
+    from gevent import monkey
+    monkey.patch_all()
+    from gevent.pool import Pool
+
+    started = time.perf_counter()
+    pool = Pool(concurrency)
+    for _ in range(jobs):
+        pool.spawn(research_job, claude_seconds)
+    pool.join()
+    wall = time.perf_counter() - started
+    return {
+        'mode': 'gevent',
+        'processes': 1,
+        'concurrency': concurrency,
+        'jobs': jobs,
+        'wall_seconds': round(wall, 2),
+        'jobs_per_second': round(jobs / wall, 2),
+        'rss_mb_total_estimate': round(rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['prefork', 'gevent', 'both'], default='both')
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--claude-seconds', type=float, default=1.0)
+    parser.add_argument('--concurrency', type=int, default=50, help='pool size for both modes')
+    args = parser.parse_args()
+
+    if args.mode == 'prefork':
+        print(json.dumps(run_prefork(args.jobs, args.concurrency, args.claude_seconds)))
+        return
+    if args.mode == 'gevent':
+        print(json.dumps(run_gevent(args.jobs, args.concurrency, args.claude_seconds)))
+        return
+
+    # Each mode in a fresh interpreter so gevent's monkey-patching can't leak into prefork
+    for mode in ('prefork', 'gevent'):
+        cmd = [sys.executable, __file__, '--mode', mode, '--jobs', str(args.jobs),
+               '--claude-seconds', str(args.claude_seconds), '--concurrency', str(args.concurrency)]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ {mode} run failed:\n{result.stderr.strip()}")
+            continue
+        print(result.stdout.strip())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import time
+from datetime import datetime, timedelta
+from json_store import load_json, save_json, locked_json
+from research_templates import get_template, template_id, system_blocks, record_usage
+
+
+# A brief is a fixed set of sections, each stored with its own generation time.
+# Sections that change slowly (what the company does) are reused for weeks, while
+# news is regenerated daily - a re-research only asks Claude for expired sections.
+SECTIONS = [
+    {'key': 'overview', 'title': '📈 What the company does', 'ttl': timedelta(days=30),
+     'instructions': 'What the company does - products, customers, business model'},
+    {'key': 'industry_size', 'title': '📊 Industry and size', 'ttl': timedelta(days=30),
+     'instructions': 'Industry and size (employees, revenue, locations - estimate if needed)'},
+    {'key': 'recent_news', 'title': '📰 Recent news or developments', 'ttl': timedelta(days=1),
+     'instructions': 'Recent news or developments'},
+    {'key': 'pain_points', 'title': '💡 Potential pain points', 'ttl': timedelta(days=7),
+     'instructions': 'Potential pain points a sales person should know'},
+]
+
+BRIEFS_FILE = 'company_briefs.json'
+
+# Output allowance per requested section, plus room for the tool call itself
+SECTION_MAX_TOKENS = 500
+
+def load_briefs():
+    return load_json(BRIEFS_FILE)
+
+
+def save_briefs(briefs):
+    save_json(BRIEFS_FILE, briefs)
+
+
+def brief_key(company_name, template):
+    """Briefs are stored per template, since each template researches differently"""
+    return f"{template['name']}:{company_name.strip().lower()}"
+
+
+def expired_sections(stored, template, now=None):
+    """Keys of sections that are missing, past their TTL, or from an older template version"""
+    now = now or datetime.utcnow()
+    if stored.get('template') != template_id(template):
+        return [s['key'] for s in SECTIONS]
+    expired = []
+    for section in SECTIONS:
+        entry = stored.get('sections', {}).get(section['key'])
+        if not entry or now - datetime.fromisoformat(entry['generated_at']) > section['ttl']:
+            expired.append(section['key'])
+    return expired
+
+
+# Always offer every section (none required) so the tool definition - which sits
+# ahead of the system prompt in the cached prefix - never changes between calls.
+BRIEF_TOOL = {
+    "name": "record_brief",
+    "description": "Record the requested research brief sections. Only fill in the sections you were asked for.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            s['key']: {"type": "string", "description": s['instructions']}
+            for s in SECTIONS
+        }
+    }
+}
+
+
+def generate_sections(claude, company_name, keys, fresh_sections, template, retry=True):
+    """Ask Claude for just the given sections; fresh ones are passed as context only"""
+    context = ""
+    if fresh_sections:
+        known = "\n\n".join(
+            f"{s['title']}\n{fresh_sections[s['key']]['content']}"
+            for s in SECTIONS if s['key'] in fresh_sections
+        )
+        context = f"\n\nThese sections are already up to date - stay consistent with them but don't repeat them:\n\n{known}"
+
+    # Everything company-specific goes last so the cached prefix stays identical
+    wanted = "\n".join(f"- {s['key']}: {s['instructions']}" for s in SECTIONS if s['key'] in keys)
+    prompt = f"""Research {company_name} for an upcoming sales meeting.
+
+Write these sections with the record_brief tool:
+{wanted}{context}"""
+
+    started = time.perf_counter()
+    message = claude.messages.create(
+        model="claude-sonnet-4-20250514",
+        max_tokens=SECTION_MAX_TOKENS * len(keys) + 200,
+        system=system_blocks(template),
+        tools=[BRIEF_TOOL],
+        tool_choice={"type": "tool", "name": "record_brief"},
+        messages=[{"role": "user", "content": prompt}]
+    )
+    record_usage(template, message.usage, time.perf_counter() - started)
+
+    tool_use = next((block for block in message.content if block.type == 'tool_use'), None)
+    if tool_use is None:
+        raise RuntimeError(f"Claude didn't call record_brief for {company_name} (stop_reason={message.stop_reason})")
+    print(f"🧩 Generated {len(keys)} section(s) for {company_name} with {template_id(template)} "
+          f"({message.usage.output_tokens} output tokens, "
+          f"{getattr(message.usage, 'cache_read_input_tokens', 0) or 0} cached input tokens)")
+    # Sections aren't required in the schema, so Claude can skip one; leave those
+    # out so they stay expired and are retried next time rather than stored blank
+    written = [key for key in tool_use.input if key in keys]
+    if message.stop_reason == 'max_tokens' and written:
+        # The last section written was cut off mid-sentence - never store it
+        print(f"⚠️ {company_name}: hit max_tokens during {written[-1]}, discarding it")
+        written = written[:-1]
+    generated = {key: str(tool_use.input.get(key) or '').strip() for key in written}
+    generated = {key: content for key, content in generated.items() if content}
+
+    missing = [key for key in keys if key not in generated]
+    if missing and retry and message.stop_reason == 'max_tokens':
+        # One more call for what didn't fit, with what we just got as context
+        fresh_sections = dict(fresh_sections, **{
+            key: {'content': content} for key, content in generated.items()
+        })
+        generated.update(generate_sections(claude, company_name, missing, fresh_sections, template, retry=False))
+        missing = [key for key in keys if key not in generated]
+    if missing:
+        print(f"⚠️ {company_name}: no content for {', '.join(missing)}, will retry on next research")
+    return generated
+
+
+def get_brief(claude, company_name, team_id=None):
+    """Stored brief for a company, regenerating only the sections that have expired"""
+    template = get_template(team_id)
+    key = brief_key(company_name, template)
+    stored = load_briefs().get(key, {'company': company_name, 'sections': {}})
+
+    expired = expired_sections(stored, template)
+    if not expired:
+        return stored
+
+    fresh = {k: v for k, v in stored['sections'].items() if k not in expired}
+    generated = generate_sections(claude, company_name, expired, fresh, template)
+
+    now = datetime.utcnow().isoformat()
+    # A skipped section keeps its old content and timestamp, so it stays expired - but
+    # content from an older template version would look current once the id is bumped
+    if stored.get('template') != template_id(template):
+        stored['sections'] = {}
+    for section_key, content in generated.items():
+        stored['sections'][section_key] = {'content': content, 'generated_at': now}
+    stored['company'] = company_name
+    stored['template'] = template_id(template)
+
+    # Re-read under the file lock so concurrent research on other companies,
+    # in this process or another worker, isn't lost
+    with locked_json(BRIEFS_FILE) as briefs:
+        briefs[key] = stored
+
+    return stored
+
+
+def brief_to_markdown(brief):
+    """Markdown version of a stored brief (used for follow-up context and text fallbacks)"""
+    parts = [f"# {brief['company']}"]
+    for section in SECTIONS:
+        entry = brief['sections'].get(section['key'])
+        if entry:
+            parts.append(f"## {section['title']}\n{entry['content']}")
+    return "\n\n".join(parts)
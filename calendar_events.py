@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+
+# Only the parts of an event we actually read (id, title, start, attendee emails)
+EVENT_FIELDS = "nextPageToken,items(id,summary,start,attendees/email)"
+
+# Google's max page size for events().list
+PAGE_SIZE = 250
+
+# Meetings this far out are the ones we notify about and research
+WINDOW_START_HOURS = 24
+WINDOW_END_HOURS = 48
+
+
+def meeting_window(start_hours=WINDOW_START_HOURS, end_hours=WINDOW_END_HOURS):
+    """Return (time_min, time_max) RFC3339 strings for the upcoming meeting window"""
+    now = datetime.utcnow()
+    time_min = (now + timedelta(hours=start_hours)).isoformat() + 'Z'
+    time_max = (now + timedelta(hours=end_hours)).isoformat() + 'Z'
+    return time_min, time_max
+
+
+def event_start(event):
+    """Naive UTC start of an event (all-day events start at midnight UTC), or None"""
+    start = event.get('start', {})
+    if start.get('dateTime'):
+        parsed = datetime.fromisoformat(start['dateTime'].replace('Z', '+00:00'))
+        return parsed.replace(tzinfo=None) - (parsed.utcoffset() or timedelta(0))
+    if start.get('date'):
+        return datetime.fromisoformat(start['date'])
+    return None
+
+
+def iter_events(service, time_min, time_max, calendar_id='primary', fields=EVENT_FIELDS):
+    """Yield every event in the window, following pageToken until exhausted.
+
+    Requests a partial response (fields mask) with gzip so we only download
+    what we use, and streams events so callers never hold a full calendar.
+    """
+    page_token = None
+    while True:
+        request = service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min,
+            timeMax=time_max,
+            maxResults=PAGE_SIZE,
+            singleEvents=True,
+            orderBy='startTime',
+            fields=fields,
+            pageToken=page_token
+        )
+        # Google only compresses responses when both headers mention gzip
+        request.headers['Accept-Encoding'] = 'gzip'
+        request.headers['User-Agent'] = f"{request.headers.get('User-Agent', '')} (gzip)".strip()
+
+        result = request.execute()
+        for event in result.get('items', []):
+            yield event
+
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            break
@@ -0,0 +1,19 @@
+import os
+import threading
+
+
+# Importing anthropic (httpx, pydantic models) is a noticeable part of startup,
+# so the client is built on first use instead of at import.
+_lock = threading.Lock()
+_claude = None
+
+
+def get_claude():
+    """Shared Anthropic client, created the first time it's needed"""
+    global _claude
+    if _claude is None:
+        with _lock:
+            if _claude is None:
+                import anthropic
+                _claude = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+    return _claude
@@ -0,0 +1,184 @@
+import json
+import os
+from datetime import datetime, timedelta
+from json_store import load_json, save_json, locked_json
+
+
+# "digest" sends each user one message per scan listing all their new meetings;
+# "per_meeting" keeps the old one-message-per-meeting behaviour.
+NOTIFICATION_MODE = os.environ.get('NOTIFICATION_MODE', 'digest')
+# At most one digest per user per window; new meetings wait for the next one
+DIGEST_WINDOW_MINUTES = int(os.environ.get('DIGEST_WINDOW_MINUTES', 60))
+# Local hours (in the calendar's timezone) when no digests go out, e.g. "22-7"; empty to disable
+QUIET_HOURS = os.environ.get('QUIET_HOURS', '22-7')
+
+# Slack allows 50 blocks; header + one section per meeting + skip button
+MAX_DIGEST_MEETINGS = 40
+
+DIGEST_STATE_FILE = 'digest_state.json'
+
+
+def load_digest_state():
+    return load_json(DIGEST_STATE_FILE)
+
+
+def save_digest_state(state):
+    save_json(DIGEST_STATE_FILE, state)
+
+
+def calendar_utc_offset(meetings):
+    """UTC offset of the user's calendar, read from a timed event's start (UTC if none)"""
+    for meeting in meetings:
+        start = meeting['start']
+        if 'T' in start:
+            offset = datetime.fromisoformat(start.replace('Z', '+00:00')).utcoffset()
+            if offset is not None:
+                return offset
+    return timedelta(0)
+
+
+def quiet_hours():
+    """(start_hour, end_hour) of the quiet window, or None if disabled"""
+    if not QUIET_HOURS or '-' not in QUIET_HOURS:
+        return None
+    start_hour, end_hour = (int(h) for h in QUIET_HOURS.split('-', 1))
+    return start_hour, end_hour
+
+
+def in_quiet_hours(utc_offset, now=None):
+    hours = quiet_hours()
+    if not hours:
+        return False
+    start_hour, end_hour = hours
+    local_hour = ((now or datetime.utcnow()) + utc_offset).hour
+    if start_hour <= end_hour:
+        return start_hour <= local_hour < end_hour
+    # Window wraps past midnight, e.g. 22-7
+    return local_hour >= start_hour or local_hour < end_hour
+
+
+def quiet_hours_end(utc_offset, now):
+    """UTC time the current quiet window ends (call only while in quiet hours)"""
+    local = now + utc_offset
+    end = local.replace(hour=quiet_hours()[1], minute=0, second=0, microsecond=0)
+    if end <= local:
+        end += timedelta(days=1)
+    return end - utc_offset
+
+
+def next_digest_time(slack_user_id, utc_offset, now=None, state=None):
+    """Earliest UTC time this user may get a digest: after the digest window and outside quiet hours"""
+    now = now or datetime.utcnow()
+    state = load_digest_state() if state is None else state
+    at = now
+    last_sent = state.get(slack_user_id, {}).get('last_digest_at')
+    if last_sent:
+        at = max(at, datetime.fromisoformat(last_sent) + timedelta(minutes=DIGEST_WINDOW_MINUTES))
+    if in_quiet_hours(utc_offset, at):
+        at = quiet_hours_end(utc_offset, at)
+    return at
+
+
+def digest_allowed(slack_user_id, meetings, now=None):
+    """True if we may send this user a digest now (outside quiet hours and the digest window)"""
+    now = now or datetime.utcnow()
+    return next_digest_time(slack_user_id, calendar_utc_offset(meetings), now) <= now
+
+
+def meeting_started(meeting, now):
+    start = meeting['start']
+    if 'T' in start:
+        parsed = datetime.fromisoformat(start.replace('Z', '+00:00'))
+        start_utc = parsed.replace(tzinfo=None) - (parsed.utcoffset() or timedelta(0))
+    else:
+        start_utc = datetime.fromisoformat(start)
+    return start_utc <= now
+
+
+def held_meetings(slack_user_id, now=None):
+    """Meetings held back from an earlier digest that haven't started yet.
+
+    These are sent with the next digest even if a scan no longer sees them -
+    by then they may have moved inside the 24h edge of the scan window.
+    """
+    now = now or datetime.utcnow()
+    held = load_digest_state().get(slack_user_id, {}).get('held', [])
+    return [meeting for meeting in held if not meeting_started(meeting, now)]
+
+
+def hold_meetings(slack_user_id, meetings):
+    """Keep meetings for the user's next digest"""
+    with locked_json(DIGEST_STATE_FILE) as state:
+        user_state = state.setdefault(slack_user_id, {})
+        held = {meeting['event_id']: meeting for meeting in user_state.get('held', [])}
+        held.update({meeting['event_id']: meeting for meeting in meetings})
+        user_state['held'] = list(held.values())
+        user_state['utc_offset_minutes'] = int(calendar_utc_offset(meetings).total_seconds() // 60)
+
+
+def held_release_at(slack_user_id, now=None):
+    """When this user's held meetings can go out, or None if nothing is held"""
+    now = now or datetime.utcnow()
+    state = load_digest_state()
+    user_state = state.get(slack_user_id, {})
+    held = [meeting for meeting in user_state.get('held', []) if not meeting_started(meeting, now)]
+    if not held:
+        return None
+    utc_offset = timedelta(minutes=user_state.get('utc_offset_minutes', 0))
+    return next_digest_time(slack_user_id, utc_offset, now, state)
+
+
+def record_digest_sent(slack_user_id, meetings, now=None):
+    """Note the digest time and drop the sent meetings from the held list"""
+    sent_ids = {meeting['event_id'] for meeting in meetings}
+    with locked_json(DIGEST_STATE_FILE) as state:
+        user_state = state.setdefault(slack_user_id, {})
+        user_state['last_digest_at'] = (now or datetime.utcnow()).isoformat()
+        user_state['meeting_count'] = len(meetings)
+        user_state['held'] = [m for m in user_state.get('held', []) if m['event_id'] not in sent_ids]
+
+
+def research_button_value(meeting):
+    """Same payload as the single-meeting notification, so proactive_research handles both"""
+    return json.dumps({
+        "meeting_id": meeting['event_id'],
+        "summary": meeting['summary'],
+        "company": ', '.join(meeting['companies']),
+        "companies": meeting['companies']
+    })
+
+
+def build_digest_blocks(meetings):
+    """One message listing every new meeting, each with its own research button"""
+    blocks = [{
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": f"📅 You have {len(meetings)} upcoming meeting{'s' if len(meetings) != 1 else ''} with external companies. Want me to research any of them?"
+        }
+    }]
+
+    for meeting in meetings:
+        blocks.append({
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"*{meeting['summary']}*\n{meeting['start']}\n{', '.join(meeting['companies'])}"
+            },
+            "accessory": {
+                "type": "button",
+                "text": {"type": "plain_text", "text": "🔍 Research"},
+                "value": research_button_value(meeting),
+                "action_id": "proactive_research"
+            }
+        })
+
+    blocks.append({
+        "type": "actions",
+        "elements": [{
+            "type": "button",
+            "text": {"type": "plain_text", "text": "Not now"},
+            "action_id": "skip_research"
+        }]
+    })
+    return blocks
@@ -0,0 +1,261 @@
+import json
+import os
+import time
+import uuid
+import redis
+
+
+# Weighted fair queuing across tenants (Slack workspaces) for research and scan tasks.
+#
+# Each tenant has its own Redis list of pending jobs. The dispatcher picks the
+# backlogged tenant with the lowest virtual time (advanced by 1/weight per job),
+# preferring tenants still under their guaranteed concurrency share, and only
+# dispatches when the tenant has rate-limit budget left. Idle slots are lent to
+# whoever is backlogged so the pool stays busy.
+#
+# A running job holds a lease (job id -> deadline in a per-tenant sorted set)
+# rather than a bare counter, so a job whose worker died mid-run frees its slot
+# once FAIR_JOB_LEASE_SECONDS pass instead of holding it forever.
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+# Green threads per io worker; the procfile passes the same variable to --concurrency
+IO_WORKER_CONCURRENCY = int(os.environ.get('IO_WORKER_CONCURRENCY', 200))
+# Defaults to one io worker's worth of slots - raise it when running more io workers
+FAIR_TOTAL_CONCURRENCY = int(os.environ.get('FAIR_TOTAL_CONCURRENCY', IO_WORKER_CONCURRENCY))
+FAIR_TENANT_RATE_PER_MIN = float(os.environ.get('FAIR_TENANT_RATE_PER_MIN', 30))
+FAIR_TENANT_BURST = float(os.environ.get('FAIR_TENANT_BURST', 10))
+# e.g. TENANT_WEIGHTS="T0123ABC:3,T0456DEF:1" - unlisted tenants get weight 1
+TENANT_WEIGHTS = os.environ.get('TENANT_WEIGHTS', '')
+# Longest a job may hold its slot; well above a slow research run
+FAIR_JOB_LEASE_SECONDS = int(os.environ.get('FAIR_JOB_LEASE_SECONDS', 900))
+LOCK_SECONDS = 10
+
+KEY_PREFIX = 'fq'
+TENANTS_KEY = f'{KEY_PREFIX}:tenants'
+VTIME_KEY = f'{KEY_PREFIX}:vtime'
+LOCK_KEY = f'{KEY_PREFIX}:dispatch_lock'
+# Set by enqueue/job_finished so a busy dispatcher knows to make another pass
+DIRTY_KEY = f'{KEY_PREFIX}:dirty'
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+return redis.call('DEL', KEYS[1])
+"""
+
+_redis = None
+
+
+def get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+
+def tenant_weights():
+    weights = {}
+    for item in TENANT_WEIGHTS.split(','):
+        if ':' in item:
+            team_id, weight = item.split(':', 1)
+            weights[team_id.strip()] = max(float(weight), 0.01)
+    return weights
+
+
+def queue_key(tenant):
+    return f'{KEY_PREFIX}:queue:{tenant}'
+
+
+def metrics_key(tenant):
+    return f'{KEY_PREFIX}:metrics:{tenant}'
+
+
+def bucket_key(tenant):
+    return f'{KEY_PREFIX}:bucket:{tenant}'
+
+
+def inflight_key(tenant):
+    return f'{KEY_PREFIX}:inflight:{tenant}'
+
+
+def enqueue(tenant, task_name, args=None, kwargs=None):
+    """Queue a task for a tenant and try to dispatch right away"""
+    r = get_redis()
+    job = {
+        'task': task_name,
+        'args': args or [],
+        'kwargs': kwargs or {},
+        'enqueued_at': time.time()
+    }
+    pipe = r.pipeline()
+    pipe.rpush(queue_key(tenant), json.dumps(job))
+    pipe.sadd(TENANTS_KEY, tenant)
+    pipe.hincrby(metrics_key(tenant), 'enqueued', 1)
+    queued = pipe.execute()[0]
+    if queued == 1:
+        floor_vtime(r, tenant)
+    r.set(DIRTY_KEY, 1)
+    return dispatch()
+
+
+def floor_vtime(r, tenant):
+    """A tenant returning from idle starts at the backlogged tenants' minimum, not its old credit"""
+    others = [t for t in r.smembers(TENANTS_KEY) if t != tenant and r.llen(queue_key(t))]
+    if not others:
+        return
+    floor = min(float(r.hget(VTIME_KEY, t) or 0) for t in others)
+    if float(r.hget(VTIME_KEY, tenant) or 0) < floor:
+        r.hset(VTIME_KEY, tenant, floor)
+
+
+def concurrency_shares(tenants):
+    """Guaranteed concurrent slots per backlogged tenant, proportional to weight"""
+    weights = tenant_weights()
+    total_weight = sum(weights.get(t, 1.0) for t in tenants) or 1.0
+    return {
+        t: max(1, int(FAIR_TOTAL_CONCURRENCY * weights.get(t, 1.0) / total_weight))
+        for t in tenants
+    }
+
+
+def take_rate_token(r, tenant, now):
+    """Token bucket per tenant; returns True if the tenant may dispatch now"""
+    bucket = r.hgetall(bucket_key(tenant))
+    tokens = float(bucket.get('tokens', FAIR_TENANT_BURST))
+    updated = float(bucket.get('updated', now))
+    tokens = min(FAIR_TENANT_BURST, tokens + (now - updated) * FAIR_TENANT_RATE_PER_MIN / 60.0)
+    if tokens < 1:
+        r.hset(bucket_key(tenant), mapping={'tokens': tokens, 'updated': now})
+        return False
+    r.hset(bucket_key(tenant), mapping={'tokens': tokens - 1, 'updated': now})
+    return True
+
+
+def pick_tenant(r, backlogged, inflight, now):
+    """Lowest virtual time wins; tenants under their share go before borrowers"""
+    shares = concurrency_shares(backlogged)
+    vtimes = {t: float(r.hget(VTIME_KEY, t) or 0) for t in backlogged}
+    ordered = sorted(backlogged, key=lambda t: (inflight.get(t, 0) >= shares[t], vtimes[t]))
+    for tenant in ordered:
+        if take_rate_token(r, tenant, now):
+            return tenant, vtimes
+    return None, vtimes
+
+
+def reap_expired_leases(r, now):
+    """Free slots held by jobs past their lease (worker killed, OOM, lost message)"""
+    for tenant in r.smembers(TENANTS_KEY):
+        expired = r.zremrangebyscore(inflight_key(tenant), 0, now)
+        if expired:
+            r.hincrby(metrics_key(tenant), 'expired', expired)
+            print(f"⚠️ Reclaimed {expired} expired slot(s) for tenant {tenant}")
+
+
+def inflight_counts(r):
+    return {t: r.zcard(inflight_key(t)) for t in r.smembers(TENANTS_KEY)}
+
+
+def dispatch():
+    """Hand queued jobs to Celery while there are free slots; returns how many were sent"""
+    r = get_redis()
+    sent = 0
+    while True:
+        # One dispatcher at a time across the bot and all workers
+        token = uuid.uuid4().hex
+        if not r.set(LOCK_KEY, token, nx=True, ex=LOCK_SECONDS):
+            return sent  # the holder sees DIRTY_KEY and makes another pass
+        r.delete(DIRTY_KEY)
+        try:
+            sent += dispatch_locked(r)
+        finally:
+            r.eval(RELEASE_LOCK_SCRIPT, 1, LOCK_KEY, token)
+        # Work that arrived while we held the lock was skipped by its own dispatch() call
+        if not r.exists(DIRTY_KEY):
+            return sent
+
+
+def dispatch_locked(r):
+    from tasks import run_tenant_job
+
+    reap_expired_leases(r, time.time())
+    sent = 0
+    while True:
+        inflight = inflight_counts(r)
+        if sum(inflight.values()) >= FAIR_TOTAL_CONCURRENCY:
+            break
+
+        backlogged = [t for t in r.smembers(TENANTS_KEY) if r.llen(queue_key(t))]
+        if not backlogged:
+            break
+
+        now = time.time()
+        tenant, vtimes = pick_tenant(r, backlogged, inflight, now)
+        if tenant is None:
+            break  # everyone backlogged is out of rate budget
+
+        raw = r.lpop(queue_key(tenant))
+        if raw is None:
+            continue
+        job = json.loads(raw)
+        job_id = uuid.uuid4().hex
+        r.zadd(inflight_key(tenant), {job_id: now + FAIR_JOB_LEASE_SECONDS})
+
+        try:
+            run_tenant_job.delay(tenant, job_id, job['task'], job['args'], job['kwargs'])
+        except Exception as e:
+            # Broker unavailable: put the job back at the front and free its slot
+            r.lpush(queue_key(tenant), raw)
+            r.zrem(inflight_key(tenant), job_id)
+            print(f"❌ Couldn't dispatch {job['task']} for tenant {tenant}, requeued: {e}")
+            break
+
+        weight = tenant_weights().get(tenant, 1.0)
+        r.hset(VTIME_KEY, tenant, vtimes[tenant] + 1.0 / weight)
+
+        wait_ms = int((now - job['enqueued_at']) * 1000)
+        pipe = r.pipeline()
+        pipe.hincrby(metrics_key(tenant), 'dispatched', 1)
+        pipe.hincrby(metrics_key(tenant), 'wait_ms_total', wait_ms)
+        pipe.execute()
+        if wait_ms > int(r.hget(metrics_key(tenant), 'wait_ms_max') or 0):
+            r.hset(metrics_key(tenant), 'wait_ms_max', wait_ms)
+        sent += 1
+
+    return sent
+
+
+def job_started(tenant, job_id):
+    """Restart the lease when the job actually starts, so time spent in the broker queue doesn't count"""
+    get_redis().zadd(inflight_key(tenant), {job_id: time.time() + FAIR_JOB_LEASE_SECONDS}, xx=True)
+
+
+def job_finished(tenant, job_id, ok, duration):
+    """Release the tenant's slot and record throughput"""
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.zrem(inflight_key(tenant), job_id)
+    pipe.hincrby(metrics_key(tenant), 'completed' if ok else 'failed', 1)
+    pipe.hincrby(metrics_key(tenant), 'run_ms_total', int(duration * 1000))
+    pipe.set(DIRTY_KEY, 1)
+    pipe.execute()
+
+
+def tenant_metrics():
+    """Per-tenant queue depth, in-flight count, queue wait and throughput"""
+    r = get_redis()
+    metrics = {}
+    for tenant in r.smembers(TENANTS_KEY):
+        m = {k: int(v) for k, v in r.hgetall(metrics_key(tenant)).items()}
+        dispatched = m.get('dispatched', 0)
+        finished = m.get('completed', 0) + m.get('failed', 0)
+        metrics[tenant] = {
+            'queued': r.llen(queue_key(tenant)),
+            'inflight': r.zcard(inflight_key(tenant)),
+            'enqueued': m.get('enqueued', 0),
+            'dispatched': dispatched,
+            'completed': m.get('completed', 0),
+            'failed': m.get('failed', 0),
+            'expired': m.get('expired', 0),
+            'avg_wait_ms': m.get('wait_ms_total', 0) // dispatched if dispatched else 0,
+            'max_wait_ms': m.get('wait_ms_max', 0),
+            'avg_run_ms': m.get('run_ms_total', 0) // finished if finished else 0
+        }
+    return metrics
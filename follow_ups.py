@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import redis
+from fair_queue import get_redis
+
+
+# Speculative follow-ups: after a brief is posted, a low-priority job guesses the
+# questions a rep is likely to ask and answers them ahead of time, so a click on
+# a suggested question is served from Redis instead of waiting on Claude.
+# Output cap for a follow-up answer, live or prefetched
+FOLLOW_UP_MAX_TOKENS = 1000
+QUESTIONS_MAX_TOKENS = 200
+PREFETCH_MAX_QUESTIONS = int(os.environ.get('PREFETCH_MAX_QUESTIONS', 3))
+# Prefetched answers get the same room as live ones; ones that hit the cap are discarded
+PREFETCH_MAX_TOKENS_PER_ANSWER = int(os.environ.get('PREFETCH_MAX_TOKENS_PER_ANSWER', FOLLOW_UP_MAX_TOKENS))
+# Total output tokens we're willing to spend speculatively on one brief, question generation included
+PREFETCH_TOKEN_BUDGET = int(os.environ.get('PREFETCH_TOKEN_BUDGET', 2500))
+PREFETCH_QUEUE = 'low_priority'
+
+# Same lifetime as the research thread itself
+SUGGESTIONS_TTL_SECONDS = 48 * 3600
+
+KEY_PREFIX = 'prefetch'
+STATS_KEY = f'{KEY_PREFIX}:stats'
+
+DEFAULT_QUESTIONS = [
+    "Who are the likely decision makers?",
+    "What's their tech stack likely to look like?",
+    "What objections should I expect?"
+]
+
+
+def build_follow_up_messages(context, question):
+    """Claude messages for a follow-up: the brief, the thread so far, then the question"""
+    messages = [
+        {
+            "role": "user",
+            "content": f"""You are a sales research assistant. Here's the research brief you provided earlier:
+
+{context['research_brief']}
+
+Company: {context['company']}
+Meeting: {context.get('meeting_summary', 'N/A')}
+
+Now the user has a follow-up question. Answer it based on the research context and your knowledge."""
+        },
+        {
+            "role": "assistant",
+            "content": "I'll answer your follow-up questions based on the research."
+        }
+    ]
+
+    for msg in context.get('conversation', []):
+        messages.append({"role": msg["role"], "content": msg["content"]})
+
+    messages.append({"role": "user", "content": question})
+    return messages
+
+
+def answer_follow_up(claude, context, question, max_tokens=FOLLOW_UP_MAX_TOKENS, allow_truncated=True):
+    """Returns (answer, output_tokens); answer is None if it hit max_tokens and allow_truncated is off"""
+    response = claude.messages.create(
+        model="claude-sonnet-4-20250514",
+        max_tokens=max_tokens,
+        messages=build_follow_up_messages(context, question)
+    )
+    if response.stop_reason == 'max_tokens' and not allow_truncated:
+        return None, response.usage.output_tokens
+    return response.content[0].text, response.usage.output_tokens
+
+
+def generate_follow_up_questions(claude, company, brief, count=PREFETCH_MAX_QUESTIONS):
+    """Ask Claude for the questions a rep is most likely to ask next; returns (questions, output_tokens)"""
+    prompt = f"""Here is a sales research brief on {company}:
+
+{brief}
+
+List the {count} follow-up questions a sales person is most likely to ask next about {company} before their meeting. Keep each under 60 characters.
+
+Respond with only a JSON array of strings."""
+
+    used = 0
+    try:
+        message = claude.messages.create(
+            model="claude-sonnet-4-20250514",
+            max_tokens=QUESTIONS_MAX_TOKENS,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        used = message.usage.output_tokens
+        match = re.search(r'\[.*\]', message.content[0].text, re.DOTALL)
+        questions = [q.strip() for q in json.loads(match.group(0)) if isinstance(q, str) and q.strip()]
+    except Exception as e:
+        print(f"⚠️ Couldn't generate follow-up questions for {company}, using defaults: {e}")
+        questions = []
+
+    return (questions or DEFAULT_QUESTIONS)[:count], used
+
+
+def suggestions_key(context_key):
+    return f'{KEY_PREFIX}:suggestions:{context_key}'
+
+
+def save_suggestions(context_key, suggestions):
+    get_redis().set(suggestions_key(context_key), json.dumps(suggestions), ex=SUGGESTIONS_TTL_SECONDS)
+
+
+def load_suggestions(context_key):
+    raw = get_redis().get(suggestions_key(context_key))
+    return json.loads(raw) if raw else []
+
+
+def record_stat(name, amount=1):
+    """Bump a prefetch counter (briefs, offered, clicks, hits, misses, truncated, tokens)"""
+    try:
+        get_redis().hincrby(STATS_KEY, name, amount)
+    except redis.RedisError:
+        pass
+
+
+def prefetch_stats():
+    """Counters plus click-through (clicks / offered) and hit rate (hits / clicks)"""
+    stats = {k: int(v) for k, v in get_redis().hgetall(STATS_KEY).items()}
+    offered = stats.get('offered', 0)
+    clicks = stats.get('clicks', 0)
+    stats['click_through'] = round(clicks / offered, 3) if offered else 0.0
+    stats['hit_rate'] = round(stats.get('hits', 0) / clicks, 3) if clicks else 0.0
+    return stats
+
+
+def build_suggestion_blocks(context_key, questions):
+    """'Suggested questions' message with one button per question"""
+    return [
+        {
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "💡 *Suggested questions* - tap one for an instant answer:"}
+        },
+        {
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {"type": "plain_text", "text": question[:75]},
+                    "value": json.dumps({"context_key": context_key, "index": i}),
+                    "action_id": f"follow_up_question_{i}"
+                }
+                for i, question in enumerate(questions)
+            ]
+        }
+    ]
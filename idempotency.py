@@ -0,0 +1,104 @@
+import json
+import os
+import time
+import redis
+from fair_queue import get_redis
+
+
+# Slack redelivers events that aren't acked fast enough, and users double-click
+# buttons. Every claim here is an atomic SET NX with a TTL in Redis so the bot
+# and all workers agree on who owns a piece of work.
+EVENT_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_EVENT_TTL_SECONDS', 3600))
+RESEARCH_WINDOW_SECONDS = int(os.environ.get('IDEMPOTENCY_WINDOW_SECONDS', 300))
+
+KEY_PREFIX = 'idem'
+SUPPRESSED_KEY = f'{KEY_PREFIX}:suppressed'
+
+
+def record_suppressed(kind):
+    """Count a dropped duplicate, by kind (event, research, ...)"""
+    try:
+        get_redis().hincrby(SUPPRESSED_KEY, kind, 1)
+    except redis.RedisError:
+        pass
+    print(f"♻️ Suppressed duplicate {kind}")
+
+
+def suppressed_counts():
+    return {kind: int(n) for kind, n in get_redis().hgetall(SUPPRESSED_KEY).items()}
+
+
+def claim_event(*delivery_ids, scope='event'):
+    """True the first time any of these ids (event_id, client_msg_id, ...) is seen in this scope.
+
+    One user message can reach several handlers (a mention in a thread fires both
+    `message` and `app_mention` with the same client_msg_id), so each handler
+    claims in its own scope. Fails open if Redis is unavailable - a duplicate
+    brief beats a dropped one.
+    """
+    ids = [i for i in delivery_ids if i]
+    if not ids:
+        return True
+    try:
+        r = get_redis()
+        for delivery_id in ids:
+            if not r.set(f'{KEY_PREFIX}:event:{scope}:{delivery_id}', 1, nx=True, ex=EVENT_TTL_SECONDS):
+                record_suppressed('event')
+                return False
+        return True
+    except redis.RedisError as e:
+        print(f"⚠️ Idempotency store unavailable, processing anyway: {e}")
+        return True
+
+
+def research_key(slack_user_id, company):
+    return f'{KEY_PREFIX}:research:{slack_user_id}:{company.strip().lower()}'
+
+
+def begin_research(slack_user_id, company):
+    """Claim (user, company) for the dedupe window.
+
+    Returns (True, None) if this caller owns the research, or (False, existing)
+    where existing is the in-flight record (may include channel/thread_ts).
+    """
+    key = research_key(slack_user_id, company)
+    record = {'status': 'in_flight', 'started_at': time.time()}
+    try:
+        r = get_redis()
+        if r.set(key, json.dumps(record), nx=True, ex=RESEARCH_WINDOW_SECONDS):
+            return True, None
+        record_suppressed('research')
+        existing = r.get(key)
+        return False, json.loads(existing) if existing else {}
+    except redis.RedisError as e:
+        print(f"⚠️ Idempotency store unavailable, processing anyway: {e}")
+        return True, None
+
+
+def update_research(slack_user_id, company, **fields):
+    """Attach details (e.g. where the brief will be posted) to an in-flight claim"""
+    key = research_key(slack_user_id, company)
+    try:
+        r = get_redis()
+        existing = r.get(key)
+        record = json.loads(existing) if existing else {}
+        record.update(fields)
+        # keepttl so updates never extend the dedupe window
+        r.set(key, json.dumps(record), keepttl=True)
+    except redis.RedisError:
+        pass
+
+
+def release_research(slack_user_id, company):
+    """Drop a claim early (e.g. after a failure) so the user can retry right away"""
+    try:
+        get_redis().delete(research_key(slack_user_id, company))
+    except redis.RedisError:
+        pass
+
+
+def duplicate_research_message(company, existing):
+    """What to tell a user whose request was folded into one already running"""
+    if existing and existing.get('status') == 'done':
+        return f"👀 I just researched {company} for you - check the brief above."
+    return f"⏳ Already researching {company} for you - the brief will appear in the same thread shortly."
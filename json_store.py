@@ -0,0 +1,56 @@
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+# The JSON state files are shared by the bot and every worker process (prefork,
+# gevent io, prefetch), so writes go to a temp file that replaces the original
+# in one step - readers see the old or the new file, never half of one - and
+# read-modify-write cycles hold an flock on a sidecar lock file across processes.
+
+
+def load_json(path):
+    """File contents, or {} if it doesn't exist (or is empty/unreadable)"""
+    try:
+        with open(path, 'r') as f:
+            content = f.read().strip()
+            if not content:
+                return {}
+            return json.loads(content)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_json(path, data):
+    """Atomically replace the file with data"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def locked_json(path):
+    """Read-modify-write under an exclusive cross-process lock.
+
+        with locked_json('scan_schedule.json') as schedule:
+            schedule[user] = state
+
+    The data is saved when the block exits normally and left untouched if it raises.
+    """
+    with open(f"{path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            data = load_json(path)
+            yield data
+            save_json(path, data)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
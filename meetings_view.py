@@ -0,0 +1,108 @@
+import os
+from datetime import datetime, timedelta
+import redis
+import fair_queue
+from calendar_events import WINDOW_END_HOURS, WINDOW_START_HOURS, event_start
+from json_store import load_json, save_json, locked_json
+from multi_research import companies_from_domains
+from tenants import tenant_id
+
+
+# Per-user snapshot of the 24-48h meeting window, written by the background
+# scans so /upcoming-meetings can render without calling Google. Scans fetch a
+# little past the window, and the window moves on between scans, so the view
+# is filtered to the current window when it's shown.
+VIEW_FILE = 'upcoming_meetings.json'
+# Idle users are scanned rarely; a view older than this queues a background scan
+VIEW_MAX_AGE_MINUTES = int(os.environ.get('MEETINGS_VIEW_MAX_AGE_MINUTES', 30))
+
+REFRESH_KEY_PREFIX = 'meetings_view:refresh'
+
+
+def load_meetings_views():
+    return load_json(VIEW_FILE)
+
+
+def save_meetings_views(views):
+    save_json(VIEW_FILE, views)
+
+
+def extract_external_domains(attendees):
+    """Email domains of attendees that look like companies (not personal gmail)"""
+    external_domains = set()
+    for attendee in attendees:
+        email = attendee.get('email', '')
+        if '@' in email and 'gmail.com' not in email:
+            external_domains.add(email.split('@')[1])
+    return external_domains
+
+
+def build_meeting_entry(event):
+    """Everything the /upcoming-meetings message needs for one calendar event"""
+    attendees = event.get('attendees', [])
+    domains = sorted(extract_external_domains(attendees))
+    return {
+        'id': event.get('id'),
+        'summary': event.get('summary', 'No title'),
+        'start': event['start'].get('dateTime', event['start'].get('date')),
+        'attendee_count': len(attendees),
+        'domains': domains,
+        'companies': companies_from_domains(domains)
+    }
+
+
+def store_meetings_view(slack_user_id, meetings):
+    """Replace a user's view with the meetings from a fresh calendar fetch"""
+    entries = [build_meeting_entry(event) for event in meetings]
+    view = {
+        'refreshed_at': datetime.utcnow().isoformat(),
+        'meetings': entries
+    }
+    # Locked read-modify-write so concurrent scans of other users aren't lost
+    with locked_json(VIEW_FILE) as views:
+        views[slack_user_id] = view
+    return view
+
+
+def get_meetings_view(slack_user_id):
+    """The user's last stored view, or None if no scan has filled it yet"""
+    return load_meetings_views().get(slack_user_id)
+
+
+def entry_start(entry):
+    """Naive UTC start of a view entry (dateTime or all-day date)"""
+    kind = 'date' if len(entry['start']) == 10 else 'dateTime'
+    return event_start({'start': {kind: entry['start']}})
+
+
+def visible_meetings(view, now=None):
+    """The view's meetings that are inside the 24-48h window right now"""
+    now = now or datetime.utcnow()
+    window_start = now + timedelta(hours=WINDOW_START_HOURS)
+    window_end = now + timedelta(hours=WINDOW_END_HOURS)
+    return [m for m in view['meetings'] if window_start <= entry_start(m) <= window_end]
+
+
+def view_is_stale(view, now=None):
+    now = now or datetime.utcnow()
+    age = now - datetime.fromisoformat(view['refreshed_at'])
+    return age > timedelta(minutes=VIEW_MAX_AGE_MINUTES)
+
+
+def request_refresh(slack_user_id, team_id=None):
+    """Queue a background scan for the user, at most once per VIEW_MAX_AGE_MINUTES.
+
+    Returns True if a scan was queued. Fails closed if Redis is down - the
+    stale view is still shown and the regular scans will catch up.
+    """
+    try:
+        claimed = fair_queue.get_redis().set(
+            f'{REFRESH_KEY_PREFIX}:{slack_user_id}', 1, nx=True, ex=VIEW_MAX_AGE_MINUTES * 60
+        )
+        if not claimed:
+            return False
+        fair_queue.enqueue(tenant_id(team_id), 'tasks.scan_calendar_for_user', [slack_user_id])
+        return True
+    except redis.RedisError as e:
+        print(f"⚠️ Couldn't queue a meetings view refresh for {slack_user_id}: {e}")
+        return False
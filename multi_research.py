@@ -0,0 +1,96 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from briefs import brief_to_markdown
+
+
+# Cap on concurrent Claude calls for a single meeting
+MAX_CONCURRENT_RESEARCH = int(os.environ.get('MAX_CONCURRENT_RESEARCH', 3))
+# Cap on how many companies one meeting researches (and shows), whatever the attendee list
+MAX_MEETING_COMPANIES = int(os.environ.get('MAX_MEETING_COMPANIES', 5))
+
+
+def domain_to_company(domain):
+    """Turn an attendee email domain into a company name to research"""
+    return domain.replace('.com', '').replace('.', ' ').title()
+
+
+def companies_from_domains(domains, limit=MAX_MEETING_COMPANIES):
+    """Company names for the external domains, in a stable order, at most `limit` of them"""
+    companies = []
+    for domain in sorted(domains):
+        company = domain_to_company(domain)
+        if company not in companies:
+            companies.append(company)
+    if len(companies) > limit:
+        print(f"⚠️ Meeting has {len(companies)} external companies, researching the first {limit}")
+        companies = companies[:limit]
+    return companies
+
+
+def research_companies(companies, research_fn, max_concurrency=MAX_CONCURRENT_RESEARCH):
+    """Research all companies concurrently; returns [(company, brief dict, error)] in input order"""
+    def run(company):
+        try:
+            return company, research_fn(company), None
+        except Exception as e:
+            print(f"❌ Error researching {company}: {e}")
+            return company, None, e
+
+    if len(companies) == 1:
+        return [run(companies[0])]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(companies)))) as pool:
+        return list(pool.map(run, companies))
+
+
+def cross_company_summary(claude, results):
+    """Short note on how the companies in one meeting relate, or None for a single company"""
+    briefs = [(company, brief) for company, brief, error in results if brief]
+    if len(briefs) < 2:
+        return None
+
+    sections = "\n\n".join(f"## {company}\n{brief_to_markdown(brief)}" for company, brief in briefs)
+    prompt = f"""A sales person has one meeting with people from several companies. Here are research briefs on each:
+
+{sections}
+
+In 2-3 sentences, explain how these companies likely relate to each other (customer, partner, integrator, etc.) and what that means for the meeting. Use markdown formatting for the output."""
+
+    try:
+        message = claude.messages.create(
+            model="claude-sonnet-4-20250514",
+            max_tokens=300,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return message.content[0].text
+    except Exception as e:
+        print(f"❌ Error generating cross-company summary: {e}")
+        return None
+
+
+def combine_briefs(results, summary=None):
+    """Merge per-company briefs (and the optional summary) into one markdown response"""
+    parts = []
+    if summary:
+        parts.append(f"# 🔗 How these companies fit together\n{summary}")
+    for company, brief, error in results:
+        if brief:
+            parts.append(brief_to_markdown(brief))
+        else:
+            parts.append(f"# {company}\n❌ Couldn't generate research: {error}")
+    return "\n\n---\n\n".join(parts)
+
+
+def research_meeting_companies(companies, research_fn, claude):
+    """Research every company in a meeting.
+
+    Returns (combined markdown brief, cross-company summary or None,
+    the brief dicts that were generated, the companies that failed).
+    """
+    results = research_companies(companies, research_fn)
+    if not any(brief for company, brief, error in results):
+        raise results[0][2]
+    summary = cross_company_summary(claude, results)
+    briefs = [brief for company, brief, error in results if brief]
+    failed = [company for company, brief, error in results if not brief]
+    return combine_briefs(results, summary), summary, briefs, failed
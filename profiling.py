@@ -0,0 +1,173 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import datetime
+
+
+# Opt-in: nothing is profiled unless a target is enabled here or via /profile
+#   PROFILE_TARGETS=handle_research_command,scan_due_calendars   (or "*" for everything)
+PROFILE_TARGETS = os.environ.get('PROFILE_TARGETS', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1))
+PROFILE_SLOW_SECONDS = float(os.environ.get('PROFILE_SLOW_SECONDS', 10))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 50))
+PROFILE_TOP_FUNCTIONS = 15
+
+# Runtime overrides from /profile, shared between the bot and workers via file
+OVERRIDES_FILE = 'profiling_overrides.json'
+INDEX_FILE = 'index.json'
+
+_lock = threading.Lock()
+_overrides_cache = {'mtime': None, 'data': {}}
+_green_warning = {'printed': False}
+
+
+def load_profiling_overrides():
+    """Load {target: sample_rate} overrides, re-reading only when the file changes"""
+    try:
+        mtime = os.path.getmtime(OVERRIDES_FILE)
+    except OSError:
+        return {}
+    if mtime != _overrides_cache['mtime']:
+        try:
+            with open(OVERRIDES_FILE, 'r') as f:
+                content = f.read().strip()
+                _overrides_cache['data'] = json.loads(content) if content else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            _overrides_cache['data'] = {}
+        _overrides_cache['mtime'] = mtime
+    return _overrides_cache['data']
+
+
+def save_profiling_overrides(overrides):
+    with open(OVERRIDES_FILE, 'w') as f:
+        json.dump(overrides, f, indent=2)
+
+
+def sample_rate_for(name):
+    """Sample rate for a handler/task name; 0 means profiling is off"""
+    overrides = load_profiling_overrides()
+    if name in overrides:
+        return overrides[name]
+    if '*' in overrides:
+        return overrides['*']
+
+    targets = {t.strip() for t in PROFILE_TARGETS.split(',') if t.strip()}
+    if name in targets or '*' in targets:
+        return PROFILE_SAMPLE_RATE
+    return 0.0
+
+
+def load_profile_index():
+    try:
+        with open(os.path.join(PROFILE_DIR, INDEX_FILE), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def top_functions(profiler, limit=PROFILE_TOP_FUNCTIONS):
+    """Top functions by cumulative time as plain dicts for the index"""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    stats.sort_stats('cumulative')
+    top = []
+    for func in stats.fcn_list[:limit]:
+        filename, lineno, funcname = func
+        calls, _, total_time, cumulative_time, _ = stats.stats[func]
+        top.append({
+            'function': f"{os.path.basename(filename)}:{lineno}({funcname})",
+            'calls': calls,
+            'tottime': round(total_time, 4),
+            'cumtime': round(cumulative_time, 4)
+        })
+    return top
+
+
+def save_profile(name, profiler, wall_time):
+    """Write a .prof into the ring directory and record it in the summary index"""
+    with _lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        timestamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        filename = f"{timestamp}_{name}.prof"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+
+        index = load_profile_index()
+        index.append({
+            'file': filename,
+            'target': name,
+            'wall_time': round(wall_time, 3),
+            'captured_at': datetime.utcnow().isoformat(),
+            'pid': os.getpid(),
+            'top': top_functions(profiler)
+        })
+
+        # Bounded ring: drop the oldest profiles once we're over the limit
+        while len(index) > PROFILE_MAX_FILES:
+            oldest = index.pop(0)
+            try:
+                os.remove(os.path.join(PROFILE_DIR, oldest['file']))
+            except OSError:
+                pass
+
+        with open(os.path.join(PROFILE_DIR, INDEX_FILE), 'w') as f:
+            json.dump(index, f, indent=2)
+
+    return filename
+
+
+def green_threads_active():
+    """True in a gevent-patched process (the io worker pool).
+
+    cProfile follows the OS thread, and every greenlet shares it, so a profile
+    taken there would charge the handler for whatever other greenlets ran while
+    it was waiting on I/O.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+def profiled(func):
+    """Sample-profile a Bolt handler or Celery task and keep the profile if it was slow"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        rate = sample_rate_for(name)
+        if rate <= 0 or random.random() >= rate:
+            return func(*args, **kwargs)
+        if green_threads_active():
+            if not _green_warning['printed']:
+                _green_warning['printed'] = True
+                print("⚠️ Profiling is skipped in gevent workers - profile these tasks on a prefork worker")
+            return func(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (e.g. a concurrent handler)
+            return func(*args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            wall_time = time.perf_counter() - started
+            if wall_time >= PROFILE_SLOW_SECONDS:
+                try:
+                    filename = save_profile(name, profiler, wall_time)
+                    print(f"🐢 {name} took {wall_time:.1f}s - saved profile {filename}")
+                except Exception as e:
+                    print(f"❌ Could not save profile for {name}: {e}")
+
+    return wrapper
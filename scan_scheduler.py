@@ -0,0 +1,162 @@
+import heapq
+import math
+import os
+from datetime import datetime, timedelta
+from calendar_events import WINDOW_END_HOURS, WINDOW_START_HOURS, event_start
+from json_store import load_json, save_json, locked_json
+
+
+# How often beat wakes the dispatcher
+TICK_SECONDS = int(os.environ.get('SCAN_TICK_SECONDS', 300))
+
+# The old fixed cadence - idle users fall back to this, and it sets the API budget
+BASE_INTERVAL_SECONDS = int(os.environ.get('SCAN_BASE_INTERVAL_SECONDS', 21600))
+MIN_INTERVAL_SECONDS = int(os.environ.get('SCAN_MIN_INTERVAL_SECONDS', 900))
+MAX_INTERVAL_SECONDS = int(os.environ.get('SCAN_MAX_INTERVAL_SECONDS', 43200))
+
+# Scans also look this far past the notification window, so the scheduler knows
+# when the next meeting will cross into it
+SCAN_LOOKAHEAD_HOURS = int(os.environ.get('SCAN_LOOKAHEAD_HOURS', 24))
+
+# Weight of the latest scan in the change-rate moving average
+CHANGE_RATE_ALPHA = 0.3
+
+SCHEDULE_FILE = 'scan_schedule.json'
+
+
+def load_scan_schedule():
+    """Load per-user scan state from file"""
+    return load_json(SCHEDULE_FILE)
+
+
+def save_scan_schedule(schedule):
+    save_json(SCHEDULE_FILE, schedule)
+
+
+def locked_scan_schedule():
+    """Scan state for a read-modify-write, locked against other workers"""
+    return locked_json(SCHEDULE_FILE)
+
+
+def meetings_fingerprint(meetings, now=None):
+    """Signature of a user's meetings so the next scan can tell if the calendar changed.
+
+    Records the window the scan covered and each event's start, because the
+    window slides between scans - meetings entering at the far edge or leaving
+    at the near edge are not changes.
+    """
+    now = now or datetime.utcnow()
+    events = {}
+    for event in meetings:
+        start = event_start(event)
+        if start:
+            key = f"{event.get('id')}@{event['start'].get('dateTime', event['start'].get('date'))}"
+            events[key] = start.isoformat()
+    return {
+        'window': [(now + timedelta(hours=WINDOW_START_HOURS)).isoformat(),
+                   (now + timedelta(hours=WINDOW_END_HOURS)).isoformat()],
+        'events': events
+    }
+
+
+def calendar_changed(previous, current):
+    """True if the events both scans' windows covered differ"""
+    if not isinstance(previous, dict):
+        # Never scanned, or state from before windows were recorded
+        return False
+    parse = datetime.fromisoformat
+    overlap_start = max(parse(previous['window'][0]), parse(current['window'][0]))
+    overlap_end = min(parse(previous['window'][1]), parse(current['window'][1]))
+    if overlap_start > overlap_end:
+        return False
+
+    def in_overlap(fingerprint):
+        return {key for key, start in fingerprint['events'].items() if overlap_start <= parse(start) <= overlap_end}
+
+    return in_overlap(previous) != in_overlap(current)
+
+
+def window_entry_time(next_meeting_start):
+    """When a meeting past the notification window will cross into it"""
+    # A minute late so the scan's timeMax is past the meeting's start
+    return next_meeting_start - timedelta(hours=WINDOW_END_HOURS) + timedelta(minutes=1)
+
+
+def compute_scan_interval(meeting_count, change_rate, next_entry_at=None, now=None):
+    """Seconds until this user should be scanned again.
+
+    Busy calendars and calendars that keep changing get scanned more often;
+    a user with nothing on the books drifts out to MAX_INTERVAL_SECONDS. Either
+    way we wake up when the next known meeting enters the notification window,
+    so its notification isn't held back by a long interval.
+    """
+    now = now or datetime.utcnow()
+
+    if meeting_count == 0 and change_rate == 0:
+        interval = MAX_INTERVAL_SECONDS
+    else:
+        interval = BASE_INTERVAL_SECONDS / (1 + meeting_count)
+        interval *= 1 - 0.75 * change_rate
+
+    if next_entry_at:
+        interval = min(interval, (next_entry_at - now).total_seconds())
+
+    return max(MIN_INTERVAL_SECONDS, min(MAX_INTERVAL_SECONDS, interval))
+
+
+def record_scan(schedule, slack_user_id, meetings, next_meeting_start=None, wake_at=None, now=None):
+    """Update a user's scan state after a scan and schedule the next one.
+
+    meetings are the ones in the notification window; next_meeting_start is the
+    start of the first meeting after it (from the lookahead), if any. wake_at
+    forces an earlier scan, e.g. when held digest meetings can go out.
+    """
+    now = now or datetime.utcnow()
+    state = schedule.get(slack_user_id, {})
+
+    fingerprint = meetings_fingerprint(meetings, now)
+    changed = 1.0 if calendar_changed(state.get('fingerprint'), fingerprint) else 0.0
+    change_rate = (1 - CHANGE_RATE_ALPHA) * state.get('change_rate', 0.0) + CHANGE_RATE_ALPHA * changed
+
+    next_entry_at = window_entry_time(next_meeting_start) if next_meeting_start else None
+    interval = compute_scan_interval(len(meetings), change_rate, next_entry_at, now)
+    if wake_at:
+        # Not floored at MIN_INTERVAL_SECONDS: held notifications shouldn't wait on the API budget
+        interval = min(interval, max(TICK_SECONDS, (wake_at - now).total_seconds()))
+
+    schedule[slack_user_id] = {
+        'last_scan_at': now.isoformat(),
+        'next_scan_at': (now + timedelta(seconds=interval)).isoformat(),
+        'meeting_count': len(meetings),
+        'change_rate': round(change_rate, 4),
+        'fingerprint': fingerprint
+    }
+    return interval
+
+
+def build_scan_heap(schedule, slack_user_ids, now=None):
+    """Min-heap of (next_scan_at, slack_user_id); never-scanned users are due immediately"""
+    now = now or datetime.utcnow()
+    heap = []
+    for slack_user_id in slack_user_ids:
+        next_scan_at = schedule.get(slack_user_id, {}).get('next_scan_at')
+        due = datetime.fromisoformat(next_scan_at) if next_scan_at else now
+        heap.append((due.timestamp(), slack_user_id))
+    heapq.heapify(heap)
+    return heap
+
+
+def scan_budget(user_count):
+    """Max scans per tick - the same average rate as scanning everyone every BASE_INTERVAL"""
+    return max(1, math.ceil(user_count * TICK_SECONDS / BASE_INTERVAL_SECONDS))
+
+
+def pop_due_users(heap, now=None, limit=None):
+    """Pop users whose next scan time has passed, soonest-overdue first"""
+    now = now or datetime.utcnow()
+    due = []
+    while heap and heap[0][0] <= now.timestamp():
+        if limit is not None and len(due) >= limit:
+            break
+        due.append(heapq.heappop(heap)[1])
+    return due
@@ -0,0 +1,116 @@
+import re
+from briefs import SECTIONS
+
+
+# Slack rejects section text over 3000 characters, and messages over 50 blocks
+MAX_SECTION_TEXT = 2900
+MAX_BLOCKS = 50
+
+
+def convert_markdown_to_slack(text):
+    """Convert common markdown to Slack's mrkdwn format"""
+    # Split into lines for better processing
+    lines = text.split('\n')
+    result_lines = []
+    
+    for line in lines:
+        # Convert headers to bold (handle with/without leading spaces and emojis)
+        if re.match(r'^\s*###\s+(.+)$', line):
+            line = re.sub(r'^\s*###\s+(.+)$', r'*\1*', line)
+        elif re.match(r'^\s*##\s+(.+)$', line):
+            line = re.sub(r'^\s*##\s+(.+)$', r'*\1*', line)
+        elif re.match(r'^\s*#\s+(.+)$', line):
+            line = re.sub(r'^\s*#\s+(.+)$', r'*\1*', line)
+        else:
+            # Convert markdown bold **text** to Slack *text* (but not if already in a header)
+            # Handle bold text that might span multiple words
+            line = re.sub(r'\*\*([^*\n]+?)\*\*', r'*\1*', line)
+            
+            # Convert markdown links [text](url) to Slack format <url|text>
+            line = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<\2|\1>', line)
+            
+            # Ensure bullet points use Slack format (•)
+            line = re.sub(r'^[\-\*]\s+', '• ', line)
+            
+            # Convert numbered lists to Slack format
+            line = re.sub(r'^\d+\.\s+', '• ', line)
+        
+        result_lines.append(line)
+    
+    return '\n'.join(result_lines)
+
+
+def truncate(text, limit=MAX_SECTION_TEXT):
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def company_blocks(brief, heading, collapsed):
+    """Blocks for one company: a section block per brief section, or one block for all of them"""
+    parts = []
+    for section in SECTIONS:
+        entry = brief['sections'].get(section['key'])
+        if entry:
+            parts.append(f"*{section['title']}*\n{convert_markdown_to_slack(entry['content'])}")
+    if collapsed:
+        text = "\n\n".join(([f"*🏢 {brief['company']}*"] if heading else []) + parts)
+        return [{"type": "section", "text": {"type": "mrkdwn", "text": truncate(text)}}]
+
+    blocks = []
+    if heading:
+        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": f"*🏢 {brief['company']}*"}})
+    for part in parts:
+        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": truncate(part)}})
+    return blocks
+
+
+def render_brief_blocks(briefs, title, summary=None, footer=None, failed=None):
+    """Block Kit for one or more company briefs (as returned by get_brief), kept under Slack's block limit.
+
+    Each brief section gets its own block; when that would exceed MAX_BLOCKS, each
+    company collapses into a single block, and companies that still don't fit are
+    listed in a note (the message text fallback carries the full brief). `failed`
+    names companies whose research errored, so the blocks say so as the text does.
+    """
+    blocks = [{
+        "type": "header",
+        "text": {"type": "plain_text", "text": truncate(title, 150)}
+    }]
+
+    if summary:
+        blocks.append({
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": truncate(f"*🔗 How these companies fit together*\n{convert_markdown_to_slack(summary)}")}
+        })
+        blocks.append({"type": "divider"})
+
+    heading = len(briefs) + len(failed or []) > 1
+    # Room left after the trailing footer, the failed note and a possible "more companies" note
+    budget = MAX_BLOCKS - len(blocks) - (1 if footer else 0) - (1 if failed else 0) - 1
+    full_size = sum(len(company_blocks(brief, heading, False)) + 1 for brief in briefs)
+    collapsed = full_size > budget
+
+    omitted = []
+    for brief in briefs:
+        rendered = company_blocks(brief, heading, collapsed) + [{"type": "divider"}]
+        if len(rendered) > budget:
+            omitted.append(brief['company'])
+            continue
+        blocks.extend(rendered)
+        budget -= len(rendered)
+
+    if failed:
+        blocks.append({
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": truncate(f"❌ Couldn't generate research for: {', '.join(failed)}")}]
+        })
+    if omitted:
+        blocks.append({
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": truncate(f"Not shown here (see the full text): {', '.join(omitted)}")}]
+        })
+    if footer:
+        blocks.append({
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": footer}]
+        })
+    return blocks
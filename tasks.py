@@ -1,70 +1,89 @@
-import os
-import json
-import re
-import ssl
-import certifi
+import time
 from datetime import datetime, timedelta
 from celery import Celery
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from slack_bolt import App
-from slack_sdk import WebClient
+from briefs import get_brief, brief_to_markdown
+from calendar_events import WINDOW_END_HOURS, WINDOW_START_HOURS, event_start, iter_events, meeting_window
+from clients import get_claude
+import fair_queue
+from meetings_view import extract_external_domains, store_meetings_view
+from multi_research import companies_from_domains, research_meeting_companies
+from digests import (
+    NOTIFICATION_MODE, MAX_DIGEST_MEETINGS, digest_allowed, record_digest_sent, hold_meetings,
+    held_meetings, held_release_at, build_digest_blocks, research_button_value
+)
+from follow_ups import (
+    PREFETCH_QUEUE, PREFETCH_MAX_TOKENS_PER_ANSWER, PREFETCH_TOKEN_BUDGET, answer_follow_up,
+    generate_follow_up_questions, save_suggestions, build_suggestion_blocks, record_stat, prefetch_stats
+)
+from profiling import profiled
+import idempotency
+from slack_format import convert_markdown_to_slack, render_brief_blocks
+from research_templates import template_stats
+from scan_scheduler import (
+    TICK_SECONDS, BASE_INTERVAL_SECONDS, SCAN_LOOKAHEAD_HOURS, locked_scan_schedule,
+    record_scan, build_scan_heap, pop_due_users, scan_budget
+)
+from tenants import get_client_for_team, tenant_id
+from json_store import load_json, save_json, locked_json
+from beat_scheduler import beat_status
 from dotenv import load_dotenv
-import anthropic
 
 load_dotenv()
 
 # Celery config
-celery = Celery('tasks', broker='redis://localhost:6379/0')
+celery = Celery('tasks', broker=fair_queue.REDIS_URL)
 celery.conf.beat_schedule = {
-    'scan-calendars-every-6-hours': {
-        'task': 'tasks.scan_all_calendars',
-        'schedule': 21600.0,  # 6 hours in seconds
+    # Adaptive per-user scans: each tick only dispatches users who are due
+    'scan-due-calendars': {
+        'task': 'tasks.scan_due_calendars',
+        'schedule': float(TICK_SECONDS),
+    },
+    # Safety net so jobs held back by a tenant's rate budget still get dispatched
+    'dispatch-fair-queue': {
+        'task': 'tasks.dispatch_fair_queue',
+        'schedule': 30.0,
     },
 }
+# Schedule state and leadership live in Redis, so beat can run on several nodes
+# (see beat_scheduler.py) instead of one process with a local celerybeat-schedule.db
+celery.conf.beat_scheduler = 'beat_scheduler:LeaseScheduler'
 
-# Create SSL context with certifi certificates
-ssl_context = ssl.create_default_context(cafile=certifi.where())
+# I/O-bound tasks (waiting on Claude, Google and Slack) go to the "io" queue,
+# served by a gevent worker running hundreds of them per process. Scheduling
+# and bookkeeping stay on the default prefork queue.
+IO_QUEUE = 'io'
+celery.conf.task_routes = {
+    'tasks.run_tenant_job': {'queue': IO_QUEUE},
+    'tasks.trigger_research_with_context': {'queue': IO_QUEUE},
+    'tasks.trigger_research': {'queue': IO_QUEUE},
+    'tasks.scan_calendar_for_user': {'queue': IO_QUEUE},
+}
 
-# Create WebClient with SSL context
-slack_client = WebClient(
-    token=os.environ.get("SLACK_BOT_TOKEN"),
-    ssl=ssl_context
-)
+# Workers only post messages, so they use bare WebClients from tenants.get_client_for_team
+# rather than a Bolt App, and the Anthropic client comes from clients.get_claude on first use.
 
-# Slack client
-slack_app = App(
-    token=os.environ.get("SLACK_BOT_TOKEN"),
-    signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
-    client=slack_client
-)
-claude = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+NOTIFIED_FILE = 'notified_meetings.json'
+RESEARCH_CONTEXTS_FILE = 'research_contexts.json'
 
 def load_tokens():
-    try:
-        with open('user_tokens.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+    return load_json('user_tokens.json')
 
 def save_tokens(tokens):
-    with open('user_tokens.json', 'w') as f:
-        json.dump(tokens, f, indent=2)
+    save_json('user_tokens.json', tokens)
 
 def load_notified_meetings():
     """Track which meetings we've already notified about"""
-    try:
-        with open('notified_meetings.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+    return load_json(NOTIFIED_FILE)
 
 def save_notified_meetings(notified):
-    with open('notified_meetings.json', 'w') as f:
-        json.dump(notified, f, indent=2)
+    save_json(NOTIFIED_FILE, notified)
 
 def get_meetings_for_user(user_creds):
-    """Fetch meetings for a single user"""
+    """Fetch meetings for a single user (generator over all pages)"""
+    # Google client libraries are slow to import; only pay for them when we scan
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+    
     credentials = Credentials(
         token=user_creds['token'],
         refresh_token=user_creds.get('refresh_token'),
@@ -76,99 +95,76 @@ def get_meetings_for_user(user_creds):
     
     service = build('calendar', 'v3', credentials=credentials)
     
-    # Get events from next 24-48 hours
-    now = datetime.utcnow()
-    time_min = (now + timedelta(hours=24)).isoformat() + 'Z'
-    time_max = (now + timedelta(hours=48)).isoformat() + 'Z'
-    
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=time_min,
-        timeMax=time_max,
-        maxResults=10,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    
-    return events_result.get('items', [])
+    # Stream events from 24 hours out to the end of the scheduling lookahead (all pages, partial response)
+    time_min, time_max = meeting_window(WINDOW_START_HOURS, WINDOW_END_HOURS + SCAN_LOOKAHEAD_HOURS)
+    return iter_events(service, time_min, time_max)
 
 # Research function
-def research_company(company_name):
-    """Generate a simple research brief using Claude"""
-    prompt = f"""You are a sales research assistant working for OutSystems, based out of the Boston office. You are an expert Solutions Architect and deep expert on enterprise software development and agentic AI. Create a brief company overview for {company_name} that would help a sales person prepare for a meeting to sell OutSystems' platform.
-
-Include:
-- 📈What the company does
-- 📊Industry and size (estimate if needed)
-- 📰Recent news or developments
-- 💡Potential pain points a sales person should know
-
-Keep it concise - 3-4 paragraphs max.
-
-Use markdown formatting for the output."""
-
-    message = claude.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=1000,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    return message.content[0].text
+def research_company(company_name, team_id=None):
+    """Structured research brief for a company, regenerating only the stale sections"""
+    return get_brief(get_claude(), company_name, team_id)
 
 @celery.task
-def trigger_research_with_context(company_name, slack_user_id, meeting_summary, channel_id, thread_ts):
-    """Background task to generate research with context tracking"""
+@profiled
+def trigger_research_with_context(company_name, slack_user_id, meeting_summary, channel_id, thread_ts, team_id=None):
+    """Background task to generate research with context tracking.
+
+    company_name may be a list to research every company in a meeting at once.
+    """
+    companies = [company_name] if isinstance(company_name, str) else list(company_name)
+    company_name = ', '.join(companies)
+    slack_client = get_client_for_team(team_id)
     try:
-        brief = research_company(company_name)
+        brief, summary, briefs, failed = research_meeting_companies(
+            companies, lambda company: research_company(company, team_id), get_claude()
+        )
         # Convert markdown and format for Slack
         formatted_brief = convert_markdown_to_slack(brief)
         
         # Open DM conversation with user
-        conversation = slack_app.client.conversations_open(users=[slack_user_id])
+        conversation = slack_client.conversations_open(users=[slack_user_id])
         dm_channel_id = conversation['channel']['id']
         
-        slack_app.client.chat_postMessage(
+        slack_client.chat_postMessage(
             channel=dm_channel_id,
             thread_ts=thread_ts,
+            blocks=render_brief_blocks(
+                briefs, f"Research Brief: {company_name}", summary,
+                footer=f"Meeting: {meeting_summary} · 💬 Ask me follow-up questions in this thread! (Available for 48 hours)",
+                failed=failed
+            ),
             text=f"*Research Brief: {company_name}*\n\n{formatted_brief}\n\n_Meeting: {meeting_summary}_\n\n_💬 Ask me follow-up questions in this thread! (Available for 48 hours)_",
             mrkdwn=True
         )
         
         # Store context for follow-up questions (shared with app.py via file)
-        def load_research_contexts():
-            try:
-                with open('research_contexts.json', 'r') as f:
-                    content = f.read().strip()
-                    if not content:
-                        return {}
-                    return json.loads(content)
-            except (FileNotFoundError, json.JSONDecodeError):
-                return {}
-        
-        def save_research_contexts(contexts):
-            with open('research_contexts.json', 'w') as f:
-                json.dump(contexts, f, indent=2)
-        
-        contexts = load_research_contexts()
         context_key = f"{dm_channel_id}_{thread_ts}"
-        contexts[context_key] = {
-            'company': company_name,
-            'research_brief': brief,
-            'created_at': datetime.utcnow().isoformat(),
-            'conversation': [],
-            'meeting_summary': meeting_summary
-        }
-        save_research_contexts(contexts)
+        with locked_json(RESEARCH_CONTEXTS_FILE) as contexts:
+            contexts[context_key] = {
+                'company': company_name,
+                'research_brief': brief,
+                'created_at': datetime.utcnow().isoformat(),
+                'conversation': [],
+                'meeting_summary': meeting_summary
+            }
+        
+        idempotency.update_research(slack_user_id, company_name, status='done')
+        prefetch_follow_ups.apply_async(
+            args=[context_key, company_name, brief, meeting_summary, dm_channel_id, thread_ts],
+            kwargs={'team_id': team_id},
+            queue=PREFETCH_QUEUE
+        )
         
         print(f"✅ Sent research for {company_name} to {slack_user_id} and stored context")
     except Exception as e:
         print(f"❌ Error generating research: {e}")
+        idempotency.release_research(slack_user_id, company_name)
         import traceback
         traceback.print_exc()
         try:
-            conversation = slack_app.client.conversations_open(users=[slack_user_id])
+            conversation = slack_client.conversations_open(users=[slack_user_id])
             dm_channel_id = conversation['channel']['id']
-            slack_app.client.chat_postMessage(
+            slack_client.chat_postMessage(
                 channel=dm_channel_id,
                 thread_ts=thread_ts,
                 text=f"❌ Sorry, couldn't generate research for {company_name}: {str(e)}"
@@ -176,39 +172,205 @@ def trigger_research_with_context(company_name, slack_user_id, meeting_summary,
         except Exception as send_error:
             print(f"❌ Could not send error message to user: {send_error}")
 
-def convert_markdown_to_slack(text):
-    """Convert common markdown to Slack's mrkdwn format"""
-    # Split into lines for better processing
-    lines = text.split('\n')
-    result_lines = []
+@celery.task
+@profiled
+def prefetch_follow_ups(context_key, company_name, brief, meeting_summary, channel_id, thread_ts, team_id=None):
+    """Low-priority: offer likely follow-up questions and answer them ahead of the click"""
+    context = {
+        'company': company_name,
+        'research_brief': brief,
+        'meeting_summary': meeting_summary,
+        'conversation': []
+    }
+    
+    questions, spent = generate_follow_up_questions(get_claude(), company_name, brief)
+    suggestions = [{'question': question, 'answer': None} for question in questions]
+    save_suggestions(context_key, suggestions)
+    
+    get_client_for_team(team_id).chat_postMessage(
+        channel=channel_id,
+        thread_ts=thread_ts,
+        blocks=build_suggestion_blocks(context_key, questions),
+        text="💡 Suggested questions"
+    )
+    record_stat('briefs')
+    record_stat('offered', len(questions))
+    
+    # Answer in order while a full-length answer still fits in this brief's budget
+    # (which already includes the question generation above)
+    for suggestion in suggestions:
+        if PREFETCH_TOKEN_BUDGET - spent < PREFETCH_MAX_TOKENS_PER_ANSWER:
+            break
+        try:
+            answer, used = answer_follow_up(
+                get_claude(), context, suggestion['question'],
+                max_tokens=PREFETCH_MAX_TOKENS_PER_ANSWER, allow_truncated=False
+            )
+        except Exception as e:
+            print(f"❌ Error prefetching answer for {company_name}: {e}")
+            break
+        spent += used
+        if answer is None:
+            # Cut off at max_tokens - leave it for a live answer on click
+            record_stat('truncated')
+            continue
+        suggestion['answer'] = answer
+        # Publish each answer as soon as it's ready
+        save_suggestions(context_key, suggestions)
+    
+    record_stat('tokens', spent)
+    print(f"✅ Prefetched {sum(1 for s in suggestions if s['answer'])}/{len(suggestions)} follow-ups for {company_name} ({spent} tokens)")
+
+def mark_notified(notified, slack_user_id, meetings):
+    """Record notifications for a batch of meetings in one write"""
+    now = datetime.utcnow().isoformat()
+    entries = {
+        f"{slack_user_id}_{meeting['event_id']}": {
+            "meeting_id": meeting['event_id'],
+            "notified_at": now
+        }
+        for meeting in meetings
+    }
+    notified.update(entries)
+    # Merge into the latest file under the lock so concurrent scans of other users aren't lost
+    with locked_json(NOTIFIED_FILE) as latest:
+        latest.update(entries)
+
+def build_meeting_notification_blocks(meeting):
+    """Single-meeting notification (per_meeting mode)"""
+    company = ', '.join(meeting['companies'])
+    return [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"📅 You have an upcoming meeting:\n*{meeting['summary']}*\n{meeting['start']}\n\nWant me to research {company} for you?"
+            }
+        },
+        {
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {
+                        "type": "plain_text",
+                        "text": "🔍 Yes, research this"
+                    },
+                    "style": "primary",
+                    "value": research_button_value(meeting),
+                    "action_id": "proactive_research"
+                },
+                {
+                    "type": "button",
+                    "text": {
+                        "type": "plain_text",
+                        "text": "Not this one"
+                    },
+                    "action_id": "skip_research"
+                }
+            ]
+        }
+    ]
+
+def notify_new_meetings(slack_client, slack_user_id, new_meetings, notified, now=None):
+    """Tell the user about new meetings (plus any held from an earlier digest); returns the meetings notified"""
+    if NOTIFICATION_MODE == 'per_meeting':
+        sent = []
+        for meeting in new_meetings:
+            slack_client.chat_postMessage(
+                channel=slack_user_id,
+                blocks=build_meeting_notification_blocks(meeting),
+                text=f"Upcoming meeting: {meeting['summary']}"
+            )
+            # Record each one as it goes out so a later failure doesn't resend it
+            mark_notified(notified, slack_user_id, [meeting])
+            sent.append(meeting)
+            print(f"✅ Notified {slack_user_id} about {meeting['summary']}")
+        return sent
     
-    for line in lines:
-        # Convert headers to bold (handle with/without leading spaces and emojis)
-        if re.match(r'^\s*###\s+(.+)$', line):
-            line = re.sub(r'^\s*###\s+(.+)$', r'*\1*', line)
-        elif re.match(r'^\s*##\s+(.+)$', line):
-            line = re.sub(r'^\s*##\s+(.+)$', r'*\1*', line)
-        elif re.match(r'^\s*#\s+(.+)$', line):
-            line = re.sub(r'^\s*#\s+(.+)$', r'*\1*', line)
-        else:
-            # Convert markdown bold **text** to Slack *text* (but not if already in a header)
-            # Handle bold text that might span multiple words
-            line = re.sub(r'\*\*([^*\n]+?)\*\*', r'*\1*', line)
-            
-            # Convert markdown links [text](url) to Slack format <url|text>
-            line = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<\2|\1>', line)
-            
-            # Ensure bullet points use Slack format (•)
-            line = re.sub(r'^[\-\*]\s+', '• ', line)
-            
-            # Convert numbered lists to Slack format
-            line = re.sub(r'^\d+\.\s+', '• ', line)
+    now = now or datetime.utcnow()
+    pending = {meeting['event_id']: meeting for meeting in held_meetings(slack_user_id, now)}
+    pending.update({meeting['event_id']: meeting for meeting in new_meetings})
+    meetings = sorted(pending.values(), key=lambda meeting: meeting['start'])
+    if not meetings:
+        return []
+    
+    # Held meetings are kept in the digest state and the scheduler wakes this user
+    # when they can go out, even if they've left the scan window by then
+    if not digest_allowed(slack_user_id, meetings, now):
+        hold_meetings(slack_user_id, meetings)
+        print(f"🌙 Holding {len(meetings)} meeting(s) for {slack_user_id} until the next digest")
+        return []
+    
+    batch = meetings[:MAX_DIGEST_MEETINGS]
+    slack_client.chat_postMessage(
+        channel=slack_user_id,
+        blocks=build_digest_blocks(batch),
+        text=f"You have {len(batch)} upcoming meetings"
+    )
+    mark_notified(notified, slack_user_id, batch)
+    record_digest_sent(slack_user_id, batch, now)
+    if len(meetings) > len(batch):
+        hold_meetings(slack_user_id, meetings[len(batch):])
+    print(f"✅ Sent {slack_user_id} a digest of {len(batch)} meeting(s)")
+    return batch
+
+def scan_user_calendar(slack_user_id, user_creds, notified, team_id=None):
+    """Scan one user's calendar and notify about new external meetings.
+
+    Returns (meetings in the 24-48h window, start of the first meeting after it
+    or None) so the scheduler can size the next scan.
+    """
+    slack_client = get_client_for_team(team_id)
+    meetings = []
+    new_meetings = []
+    next_meeting_start = None
+    window_end = datetime.utcnow() + timedelta(hours=WINDOW_END_HOURS)
+    
+    for event in get_meetings_for_user(user_creds):
+        start = event_start(event)
+        if start and start >= window_end:
+            # Lookahead only - events come in start order, so this is the next to enter the window
+            next_meeting_start = start
+            break
+        meetings.append(event)
+        event_id = event.get('id')
+        attendees = event.get('attendees', [])
         
-        result_lines.append(line)
+        # Check if we've already notified about this meeting
+        notification_key = f"{slack_user_id}_{event_id}"
+        if notification_key in notified:
+            continue
+        
+        # Extract external domains
+        external_domains = extract_external_domains(attendees)
+        
+        if not external_domains:
+            continue  # Skip meetings without external attendees
+        
+        new_meetings.append({
+            'event_id': event_id,
+            'summary': event.get('summary', 'No title'),
+            'start': event['start'].get('dateTime', event['start'].get('date')),
+            'companies': companies_from_domains(external_domains)
+        })
+    
+    notify_new_meetings(slack_client, slack_user_id, new_meetings, notified)
     
-    return '\n'.join(result_lines)
+    # Keep /upcoming-meetings current without it having to call Google
+    store_meetings_view(slack_user_id, meetings)
+    
+    return meetings, next_meeting_start
+
+def iter_connected_users(tokens):
+    """Yield (slack_user_id, credentials, team_id) for every user with a connected calendar"""
+    for state, data in tokens.items():
+        if 'credentials' not in data or 'slack_user_id' not in data:
+            continue
+        yield data['slack_user_id'], data['credentials'], data.get('team_id')
 
 @celery.task
+@profiled
 def scan_all_calendars():
     """Scan all connected calendars and send proactive notifications"""
     print("🔍 Scanning all user calendars...")
@@ -216,112 +378,114 @@ def scan_all_calendars():
     tokens = load_tokens()
     notified = load_notified_meetings()
     
-    for state, data in tokens.items():
-        if 'credentials' not in data or 'slack_user_id' not in data:
-            continue
-        
-        slack_user_id = data['slack_user_id']
-        user_creds = data['credentials']
-        
+    for slack_user_id, user_creds, team_id in iter_connected_users(tokens):
         try:
-            meetings = get_meetings_for_user(user_creds)
-            
-            for event in meetings:
-                event_id = event.get('id')
-                summary = event.get('summary', 'No title')
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                attendees = event.get('attendees', [])
-                
-                # Check if we've already notified about this meeting
-                notification_key = f"{slack_user_id}_{event_id}"
-                if notification_key in notified:
-                    continue
-                
-                # Extract external domains
-                external_domains = set()
-                for attendee in attendees:
-                    email = attendee.get('email', '')
-                    if '@' in email and 'gmail.com' not in email:
-                        domain = email.split('@')[1]
-                        external_domains.add(domain)
-                
-                if not external_domains:
-                    continue  # Skip meetings without external attendees
-                
-                # Send proactive notification
-                company = list(external_domains)[0].replace('.com', '').replace('.', ' ').title()
-                
-                blocks = [
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": f"📅 You have an upcoming meeting:\n*{summary}*\n{start}\n\nWant me to research {company} for you?"
-                        }
-                    },
-                    {
-                        "type": "actions",
-                        "elements": [
-                            {
-                                "type": "button",
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": "🔍 Yes, research this"
-                                },
-                                "style": "primary",
-                                "value": json.dumps({
-                                    "meeting_id": event_id,
-                                    "summary": summary,
-                                    "company": company
-                                }),
-                                "action_id": "proactive_research"
-                            },
-                            {
-                                "type": "button",
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": "Not this one"
-                                },
-                                "action_id": "skip_research"
-                            }
-                        ]
-                    }
-                ]
-                
-                slack_app.client.chat_postMessage(
-                    channel=slack_user_id,
-                    blocks=blocks,
-                    text=f"Upcoming meeting: {summary}"
-                )
-                
-                # Mark as notified
-                notified[notification_key] = {
-                    "meeting_id": event_id,
-                    "notified_at": datetime.utcnow().isoformat()
-                }
-                save_notified_meetings(notified)
-                
-                print(f"✅ Notified {slack_user_id} about {summary}")
-                
+            meetings, next_meeting_start = scan_user_calendar(slack_user_id, user_creds, notified, team_id)
+            with locked_scan_schedule() as schedule:
+                record_scan(schedule, slack_user_id, meetings, next_meeting_start, held_release_at(slack_user_id))
         except Exception as e:
             print(f"❌ Error scanning calendar for {slack_user_id}: {e}")
     
     print("✅ Calendar scan complete")
 
 @celery.task
-def trigger_research(company_name, slack_user_id, meeting_summary):
+@profiled
+def scan_due_calendars():
+    """Queue scans for the users whose adaptive next-scan time has come up"""
+    tokens = load_tokens()
+    users = {user_id: team_id for user_id, user_creds, team_id in iter_connected_users(tokens)}
+    if not users:
+        return
+    
+    with locked_scan_schedule() as schedule:
+        heap = build_scan_heap(schedule, users.keys())
+        due_users = pop_due_users(heap, limit=scan_budget(len(users)))
+        # Hold each user at the base cadence until their scan reports back,
+        # so a slow tenant queue doesn't get the same user queued every tick
+        for slack_user_id in due_users:
+            schedule.setdefault(slack_user_id, {})['next_scan_at'] = (
+                datetime.utcnow() + timedelta(seconds=BASE_INTERVAL_SECONDS)
+            ).isoformat()
+    if not due_users:
+        return
+    
+    print(f"🔍 Queueing {len(due_users)} of {len(users)} calendars due this tick...")
+    for slack_user_id in due_users:
+        team_id = users[slack_user_id]
+        fair_queue.enqueue(tenant_id(team_id), 'tasks.scan_calendar_for_user', [slack_user_id])
+
+@celery.task
+@profiled
+def scan_calendar_for_user(slack_user_id):
+    """Scan a single user's calendar and schedule their next scan"""
+    tokens = load_tokens()
+    user = next((u for u in iter_connected_users(tokens) if u[0] == slack_user_id), None)
+    if not user:
+        return
+    
+    slack_user_id, user_creds, team_id = user
+    try:
+        meetings, next_meeting_start = scan_user_calendar(slack_user_id, user_creds, load_notified_meetings(), team_id)
+    except Exception as e:
+        print(f"❌ Error scanning calendar for {slack_user_id}: {e}")
+        return
+    
+    with locked_scan_schedule() as schedule:
+        interval = record_scan(schedule, slack_user_id, meetings, next_meeting_start, held_release_at(slack_user_id))
+    print(f"⏱️ Next scan for {slack_user_id} in {int(interval // 60)} min ({len(meetings)} meetings)")
+
+@celery.task
+def run_tenant_job(tenant, job_id, task_name, args, kwargs):
+    """Run a fair-queued task in this worker, then free its tenant slot"""
+    fair_queue.job_started(tenant, job_id)
+    started = time.perf_counter()
+    ok = False
+    try:
+        celery.tasks[task_name](*args, **kwargs)
+        ok = True
+    finally:
+        fair_queue.job_finished(tenant, job_id, ok, time.perf_counter() - started)
+        fair_queue.dispatch()
+
+@celery.task
+def dispatch_fair_queue():
+    fair_queue.dispatch()
+
+@celery.task
+def report_fair_queue_metrics():
+    """Print per-tenant queue wait and throughput"""
+    for tenant, m in fair_queue.tenant_metrics().items():
+        print(f"📊 {tenant}: queued={m['queued']} inflight={m['inflight']} completed={m['completed']} "
+              f"failed={m['failed']} expired={m['expired']} avg_wait={m['avg_wait_ms']}ms max_wait={m['max_wait_ms']}ms avg_run={m['avg_run_ms']}ms")
+    print(f"♻️ Suppressed duplicates: {idempotency.suppressed_counts()}")
+    print(f"💡 Follow-up prefetch: {prefetch_stats()}")
+    for template, s in template_stats().items():
+        print(f"🧩 {template}: calls={s['calls']} cached_input_ratio={s['cached_input_ratio']} "
+              f"avg_latency_cached={s['avg_latency_ms_cached']}ms avg_latency_uncached={s['avg_latency_ms_uncached']}ms")
+    beat = beat_status()
+    print(f"👑 Beat leader: {beat['leader'] or 'none'} (fencing token {beat['fencing_token']})")
+    return fair_queue.tenant_metrics()
+
+@celery.task
+@profiled
+def trigger_research(company_name, slack_user_id, meeting_summary, team_id=None):
     """Background task to generate research"""
+    slack_client = get_client_for_team(team_id)
     try:
-        brief = research_company(company_name)
+        brief_data = research_company(company_name, team_id)
         # Convert markdown and format for Slack
-        formatted_brief = convert_markdown_to_slack(brief)
+        formatted_brief = convert_markdown_to_slack(brief_to_markdown(brief_data))
         
         # Open DM conversation with user
-        conversation = slack_app.client.conversations_open(users=[slack_user_id])
+        conversation = slack_client.conversations_open(users=[slack_user_id])
         channel_id = conversation['channel']['id']
         
-        slack_app.client.chat_postMessage(
+        slack_client.chat_postMessage(
             channel=channel_id,
+            blocks=render_brief_blocks(
+                [brief_data], f"Research Brief: {company_name}",
+                footer=f"Meeting: {meeting_summary} · Ask me follow-up questions in this thread!"
+            ),
             text=f"*Research Brief: {company_name}*\n\n{formatted_brief}\n\n_Meeting: {meeting_summary}_\n_Ask me follow-up questions in this thread!_",
             mrkdwn=True
         )
@@ -333,9 +497,9 @@ def trigger_research(company_name, slack_user_id, meeting_summary):
         traceback.print_exc()
         try:
             # Try to send error message
-            conversation = slack_app.client.conversations_open(users=[slack_user_id])
+            conversation = slack_client.conversations_open(users=[slack_user_id])
             channel_id = conversation['channel']['id']
-            slack_app.client.chat_postMessage(
+            slack_client.chat_postMessage(
                 channel=channel_id,
                 text=f"❌ Sorry, couldn't generate research for {company_name}: {str(e)}"
             )
@@ -0,0 +1,73 @@
+import os
+import ssl
+import threading
+import certifi
+from slack_sdk import WebClient
+from slack_sdk.oauth.installation_store import FileInstallationStore
+from slack_sdk.oauth.state_store import FileOAuthStateStore
+
+
+# Multi-workspace mode is on when the Slack app's OAuth credentials are configured;
+# otherwise everything runs on the single SLACK_BOT_TOKEN as before.
+SLACK_CLIENT_ID = os.environ.get('SLACK_CLIENT_ID')
+SLACK_CLIENT_SECRET = os.environ.get('SLACK_CLIENT_SECRET')
+SLACK_SCOPES = ['chat:write', 'commands', 'im:history', 'im:read', 'im:write', 'app_mentions:read']
+INSTALLATION_DIR = os.environ.get('SLACK_INSTALLATION_DIR', './data/installations')
+STATE_DIR = os.environ.get('SLACK_OAUTH_STATE_DIR', './data/oauth_states')
+
+# Tenant used for single-workspace installs and anything without a team_id
+DEFAULT_TENANT = 'default'
+
+installation_store = FileInstallationStore(base_dir=INSTALLATION_DIR)
+
+ssl_context = ssl.create_default_context(cafile=certifi.where())
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def multi_workspace_enabled():
+    return bool(SLACK_CLIENT_ID and SLACK_CLIENT_SECRET)
+
+
+def get_oauth_settings():
+    """Bolt OAuthSettings for multi-workspace installs (None in single-workspace mode)"""
+    if not multi_workspace_enabled():
+        return None
+
+    from slack_bolt.oauth.oauth_settings import OAuthSettings
+
+    return OAuthSettings(
+        client_id=SLACK_CLIENT_ID,
+        client_secret=SLACK_CLIENT_SECRET,
+        scopes=SLACK_SCOPES,
+        installation_store=installation_store,
+        state_store=FileOAuthStateStore(expiration_seconds=600, base_dir=STATE_DIR)
+    )
+
+
+def tenant_id(team_id):
+    """Normalize a Slack team_id into the key used for queues and metrics"""
+    return team_id or DEFAULT_TENANT
+
+
+def get_bot_token(team_id=None):
+    """Bot token for a workspace, falling back to SLACK_BOT_TOKEN"""
+    if multi_workspace_enabled() and team_id and team_id != DEFAULT_TENANT:
+        bot = installation_store.find_bot(enterprise_id=None, team_id=team_id)
+        if bot:
+            return bot.bot_token
+        print(f"⚠️ No installation found for team {team_id}, using default bot token")
+    return os.environ.get("SLACK_BOT_TOKEN")
+
+
+def get_client_for_team(team_id=None):
+    """WebClient for a workspace, reused across calls until its token changes"""
+    token = get_bot_token(team_id)
+    key = tenant_id(team_id)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None or client.token != token:
+            client = WebClient(token=token, ssl=ssl_context)
+            _clients[key] = client
+    return client
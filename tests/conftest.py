@@ -0,0 +1,38 @@
+import os
+import sys
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fair_queue  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """JSON state files are relative paths - keep each test's in its own directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """In-memory Redis (with Lua) behind fair_queue.get_redis for every module that uses it"""
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(fair_queue, '_redis', client)
+    return client
+
+
+class FakeSlack:
+    """Records chat_postMessage calls; fail_on=n raises on the n-th call (1-based)"""
+
+    def __init__(self, fail_on=None):
+        self.posts = []
+        self.fail_on = fail_on
+
+    def chat_postMessage(self, **kwargs):
+        if self.fail_on == len(self.posts) + 1:
+            raise RuntimeError('slack is down')
+        self.posts.append(kwargs)
+        return {'ok': True, 'ts': str(len(self.posts))}
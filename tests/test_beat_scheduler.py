@@ -0,0 +1,92 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import beat_scheduler
+import tasks
+from beat_scheduler import LAST_RUN_KEY, LEADER_KEY, LeaseScheduler
+
+
+@pytest.fixture
+def nodes(redis_client, monkeypatch):
+    """Two beat nodes sharing one Redis; applied entries are recorded per node, not sent"""
+    monkeypatch.setattr(beat_scheduler, 'BEAT_LEASE_SECONDS', 0.2)
+    applied = {'a': [], 'b': []}
+    created = {}
+    for name in applied:
+        node = LeaseScheduler(tasks.celery, lazy=True)
+        node.setup_schedule()
+        node.apply_entry = lambda entry, producer=None, name=name: applied[name].append(entry.name)
+        node.producer = None  # no broker connection
+        created[name] = node
+    created['applied'] = applied
+    return created
+
+
+def overdue(redis_client, entry='scan-due-calendars'):
+    long_ago = datetime.now(timezone.utc) - timedelta(days=1)
+    redis_client.hset(LAST_RUN_KEY, entry, long_ago.isoformat())
+    return long_ago.isoformat()
+
+
+def test_one_leader_at_a_time(nodes, redis_client):
+    a, b = nodes['a'], nodes['b']
+
+    assert a.hold_lease()
+    assert not b.hold_lease()
+    # Renewing keeps the same lease and fencing token
+    lease = a.lease
+    assert a.hold_lease()
+    assert a.lease == lease
+    assert redis_client.get(LEADER_KEY) == lease
+
+
+def test_follower_takes_over_after_the_lease_expires(nodes, redis_client):
+    a, b = nodes['a'], nodes['b']
+    a.hold_lease()
+    stale_lease = a.lease
+
+    time.sleep(0.3)  # a stalls past its TTL
+
+    assert b.hold_lease()
+    assert int(b.lease.rsplit(':', 1)[1]) > int(stale_lease.rsplit(':', 1)[1])
+    # a finds out on its next renew and stands by
+    assert not a.hold_lease()
+    assert a.lease is None
+
+
+def test_stale_leader_cannot_claim_a_run(nodes, redis_client):
+    a, b = nodes['a'], nodes['b']
+    a.hold_lease()
+    stored = overdue(redis_client)
+    entry = a.schedule['scan-due-calendars']
+    time.sleep(0.3)
+    b.hold_lease()
+
+    assert a.claim_run(entry, stored, datetime.now(timezone.utc)) == -1
+    assert b.claim_run(entry, stored, datetime.now(timezone.utc)) == 1
+    # Same expected last run again: someone already claimed it
+    assert b.claim_run(entry, stored, datetime.now(timezone.utc)) == 0
+
+
+def test_only_the_leader_dispatches_a_due_entry_once(nodes, redis_client):
+    a, b = nodes['a'], nodes['b']
+    overdue(redis_client)
+
+    a.tick()
+    b.tick()
+    a.tick()
+
+    assert nodes['applied']['a'] == ['scan-due-calendars']
+    assert nodes['applied']['b'] == []
+
+
+def test_close_hands_over_immediately(nodes, redis_client):
+    a, b = nodes['a'], nodes['b']
+    a.hold_lease()
+
+    a.close()
+
+    assert redis_client.get(LEADER_KEY) is None
+    assert b.hold_lease()
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+import briefs
+
+
+class FakeClaude:
+    """Returns the queued responses in order and records each request"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.messages = self
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.responses.pop(0)
+
+
+def response(sections=None, stop_reason='tool_use'):
+    content = [SimpleNamespace(type='text', text='Looking into it')]
+    if sections is not None:
+        content.append(SimpleNamespace(type='tool_use', input=sections))
+    usage = SimpleNamespace(input_tokens=100, output_tokens=50, cache_read_input_tokens=0, cache_creation_input_tokens=0)
+    return SimpleNamespace(content=content, usage=usage, stop_reason=stop_reason)
+
+
+ALL_KEYS = [s['key'] for s in briefs.SECTIONS]
+
+
+def test_truncated_section_is_discarded_and_retried(redis_client):
+    claude = FakeClaude(
+        response({'overview': 'Makes widgets', 'industry_size': 'Manufacturing, 200 emp'}, stop_reason='max_tokens'),
+        response({'industry_size': 'Manufacturing, 250 employees', 'recent_news': 'New plant',
+                  'pain_points': 'Supply chain'})
+    )
+
+    brief = briefs.get_brief(claude, 'Acme')
+
+    assert {k: v['content'] for k, v in brief['sections'].items()} == {
+        'overview': 'Makes widgets',
+        'industry_size': 'Manufacturing, 250 employees',
+        'recent_news': 'New plant',
+        'pain_points': 'Supply chain',
+    }
+    # The retry only asks for what was cut off or never written
+    retry_prompt = claude.requests[1]['messages'][0]['content']
+    assert '- overview:' not in retry_prompt
+    assert 'Makes widgets' in retry_prompt
+
+
+def test_blank_sections_are_not_stored(redis_client):
+    claude = FakeClaude(response({'overview': 'Makes widgets', 'industry_size': '  ', 'recent_news': 'New plant',
+                                  'pain_points': 'Supply chain'}))
+
+    brief = briefs.get_brief(claude, 'Acme')
+
+    assert 'industry_size' not in brief['sections']
+    assert briefs.expired_sections(brief, briefs.get_template()) == ['industry_size']
+
+
+def test_missing_tool_call_raises(redis_client):
+    claude = FakeClaude(response(stop_reason='end_turn'))
+
+    with pytest.raises(RuntimeError, match='stop_reason=end_turn'):
+        briefs.get_brief(claude, 'Acme')
+    assert briefs.load_briefs() == {}
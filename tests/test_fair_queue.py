@@ -0,0 +1,86 @@
+import time
+from collections import Counter
+
+import pytest
+
+import fair_queue
+import tasks
+
+
+@pytest.fixture
+def sent(redis_client, monkeypatch):
+    """Jobs handed to Celery, as (tenant, job_id, task_name)"""
+    calls = []
+    monkeypatch.setattr(tasks.run_tenant_job, 'delay',
+                        lambda tenant, job_id, task, args, kwargs: calls.append((tenant, job_id, task)))
+    monkeypatch.setattr(fair_queue, 'FAIR_TENANT_BURST', 100)
+    return calls
+
+
+def enqueue_without_dispatch(monkeypatch, tenant, count):
+    with monkeypatch.context() as m:
+        m.setattr(fair_queue, 'dispatch', lambda: 0)
+        for i in range(count):
+            fair_queue.enqueue(tenant, 'tasks.scan_calendar_for_user', [f'U{i}'])
+
+
+def test_slots_are_shared_by_weight(sent, monkeypatch):
+    monkeypatch.setattr(fair_queue, 'TENANT_WEIGHTS', 'big:3,small:1')
+    monkeypatch.setattr(fair_queue, 'FAIR_TOTAL_CONCURRENCY', 8)
+    enqueue_without_dispatch(monkeypatch, 'big', 20)
+    enqueue_without_dispatch(monkeypatch, 'small', 20)
+
+    assert fair_queue.dispatch() == 8
+    assert Counter(tenant for tenant, _, _ in sent) == {'big': 6, 'small': 2}
+    assert fair_queue.inflight_counts(fair_queue.get_redis()) == {'big': 6, 'small': 2}
+
+
+def test_tenant_returning_from_idle_does_not_keep_old_credit(sent, redis_client, monkeypatch):
+    monkeypatch.setattr(fair_queue, 'FAIR_TOTAL_CONCURRENCY', 4)
+    redis_client.hset(fair_queue.VTIME_KEY, mapping={'busy': 50, 'returning': 2})
+    enqueue_without_dispatch(monkeypatch, 'busy', 10)
+    enqueue_without_dispatch(monkeypatch, 'returning', 10)
+
+    assert float(redis_client.hget(fair_queue.VTIME_KEY, 'returning')) == 50
+    fair_queue.dispatch()
+    assert Counter(tenant for tenant, _, _ in sent) == {'busy': 2, 'returning': 2}
+
+
+def test_expired_leases_free_their_slots(sent, redis_client, monkeypatch):
+    monkeypatch.setattr(fair_queue, 'FAIR_TOTAL_CONCURRENCY', 1)
+    enqueue_without_dispatch(monkeypatch, 'T1', 2)
+    assert fair_queue.dispatch() == 1
+    # The worker running it died - nothing will call job_finished
+    assert fair_queue.dispatch() == 0
+
+    inflight = fair_queue.inflight_key('T1')
+    (job_id, _), = redis_client.zrange(inflight, 0, -1, withscores=True)
+    redis_client.zadd(inflight, {job_id: time.time() - 1})
+
+    assert fair_queue.dispatch() == 1
+    assert redis_client.hget(fair_queue.metrics_key('T1'), 'expired') == '1'
+
+
+def test_finished_job_releases_its_slot(sent, redis_client, monkeypatch):
+    monkeypatch.setattr(fair_queue, 'FAIR_TOTAL_CONCURRENCY', 1)
+    enqueue_without_dispatch(monkeypatch, 'T1', 2)
+    fair_queue.dispatch()
+
+    tenant, job_id, _ = sent[0]
+    fair_queue.job_finished(tenant, job_id, True, 0.5)
+
+    assert fair_queue.dispatch() == 1
+    assert len(sent) == 2
+
+
+def test_broker_failure_requeues_the_job(redis_client, monkeypatch):
+    def broker_down(*args):
+        raise ConnectionError('broker unavailable')
+    monkeypatch.setattr(tasks.run_tenant_job, 'delay', broker_down)
+    enqueue_without_dispatch(monkeypatch, 'T1', 1)
+
+    assert fair_queue.dispatch() == 0
+    assert redis_client.llen(fair_queue.queue_key('T1')) == 1
+    assert redis_client.zcard(fair_queue.inflight_key('T1')) == 0
+    # The dispatch lock was released for the next attempt
+    assert not redis_client.exists(fair_queue.LOCK_KEY)
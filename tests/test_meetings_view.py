@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import fair_queue
+import meetings_view
+
+NOW = datetime(2026, 10, 20, 12, 0)
+
+
+def entry(event_id, start):
+    return {'id': event_id, 'summary': event_id, 'start': start, 'attendee_count': 2, 'domains': [], 'companies': []}
+
+
+def test_only_meetings_in_the_current_window_are_visible():
+    view = {'refreshed_at': NOW.isoformat(), 'meetings': [
+        entry('too_soon', '2026-10-21T11:00:00Z'),
+        entry('in_window', '2026-10-21T09:00:00-05:00'),
+        entry('all_day', '2026-10-22'),
+        entry('lookahead', '2026-10-22T13:00:00Z'),
+    ]}
+
+    visible = meetings_view.visible_meetings(view, now=NOW)
+
+    assert [m['id'] for m in visible] == ['in_window', 'all_day']
+
+
+def test_stale_view_queues_one_background_scan(redis_client, monkeypatch):
+    monkeypatch.setattr(fair_queue, 'dispatch', lambda: 0)
+    view = {'refreshed_at': (NOW - timedelta(minutes=45)).isoformat(), 'meetings': []}
+
+    assert meetings_view.view_is_stale(view, now=NOW)
+    assert meetings_view.request_refresh('U1', 'T1')
+    assert not meetings_view.request_refresh('U1', 'T1')
+
+    queued = redis_client.lrange(fair_queue.queue_key('T1'), 0, -1)
+    assert len(queued) == 1
+    assert '"tasks.scan_calendar_for_user"' in queued[0]
+
+
+def test_fresh_view_is_not_stale():
+    view = {'refreshed_at': (NOW - timedelta(minutes=5)).isoformat(), 'meetings': []}
+
+    assert not meetings_view.view_is_stale(view, now=NOW)
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import digests
+import tasks
+from conftest import FakeSlack
+from scan_scheduler import record_scan
+
+# 23:00 local for a calendar on UTC-5
+LATE_EVENING = datetime(2026, 10, 20, 4, 0)
+
+
+def meeting(event_id, start):
+    return {'event_id': event_id, 'summary': f'Sync {event_id}', 'start': start, 'companies': ['Acme']}
+
+
+def test_meeting_held_in_quiet_hours_is_sent_when_they_end(monkeypatch):
+    monkeypatch.setattr(tasks, 'NOTIFICATION_MODE', 'digest')
+    monkeypatch.setattr(digests, 'QUIET_HOURS', '22-7')
+    # Found 25h out at 23:00 local - inside the scan window, but in quiet hours
+    held = meeting('e1', '2026-10-21T00:00:00-05:00')
+    slack, notified = FakeSlack(), {}
+
+    assert tasks.notify_new_meetings(slack, 'U1', [held], notified, now=LATE_EVENING) == []
+    assert slack.posts == []
+
+    # Quiet hours end at 07:00 local; the scheduler wakes the user then, well
+    # before the idle interval would have
+    release = digests.held_release_at('U1', now=LATE_EVENING)
+    assert release == datetime(2026, 10, 20, 12, 0)
+    schedule = {}
+    record_scan(schedule, 'U1', [], wake_at=release, now=LATE_EVENING)
+    assert datetime.fromisoformat(schedule['U1']['next_scan_at']) == release
+
+    # By then the meeting is 17h out and the scan no longer returns it
+    sent = tasks.notify_new_meetings(slack, 'U1', [], notified, now=release)
+    assert [m['event_id'] for m in sent] == ['e1']
+    assert len(slack.posts) == 1
+    assert 'U1_e1' in tasks.load_notified_meetings()
+    assert digests.held_meetings('U1', now=release) == []
+    assert digests.held_release_at('U1', now=release) is None
+
+
+def test_held_meetings_that_started_are_dropped(monkeypatch):
+    monkeypatch.setattr(tasks, 'NOTIFICATION_MODE', 'digest')
+    monkeypatch.setattr(digests, 'QUIET_HOURS', '22-7')
+    digests.hold_meetings('U1', [meeting('e1', '2026-10-20T05:00:00-05:00')])
+
+    assert digests.held_meetings('U1', now=datetime(2026, 10, 20, 11, 0)) == []
+    assert digests.held_release_at('U1', now=datetime(2026, 10, 20, 11, 0)) is None
+
+
+def test_digest_window_holds_until_it_expires(monkeypatch):
+    monkeypatch.setattr(tasks, 'NOTIFICATION_MODE', 'digest')
+    monkeypatch.setattr(digests, 'QUIET_HOURS', '')
+    monkeypatch.setattr(digests, 'DIGEST_WINDOW_MINUTES', 60)
+    noon = datetime(2026, 10, 20, 12, 0)
+    slack, notified = FakeSlack(), {}
+
+    tasks.notify_new_meetings(slack, 'U1', [meeting('e1', '2026-10-21T14:00:00Z')], notified, now=noon)
+    later = noon + timedelta(minutes=10)
+    assert tasks.notify_new_meetings(slack, 'U1', [meeting('e2', '2026-10-21T15:00:00Z')], notified, now=later) == []
+    assert digests.held_release_at('U1', now=later) == noon + timedelta(minutes=60)
+
+
+def test_per_meeting_records_each_post_before_a_failure(monkeypatch):
+    monkeypatch.setattr(tasks, 'NOTIFICATION_MODE', 'per_meeting')
+    slack, notified = FakeSlack(fail_on=2), {}
+    meetings = [meeting('e1', '2026-10-21T14:00:00Z'), meeting('e2', '2026-10-21T15:00:00Z')]
+
+    with pytest.raises(RuntimeError):
+        tasks.notify_new_meetings(slack, 'U1', meetings, notified)
+
+    stored = tasks.load_notified_meetings()
+    assert 'U1_e1' in stored
+    assert 'U1_e2' not in stored
+
+
+@pytest.mark.parametrize('quiet, local_hour, expected', [
+    ('22-7', 23, True),
+    ('22-7', 3, True),
+    ('22-7', 7, False),
+    ('22-7', 12, False),
+    ('12-14', 13, True),
+    ('12-14', 14, False),
+    ('', 3, False),
+])
+def test_in_quiet_hours(monkeypatch, quiet, local_hour, expected):
+    monkeypatch.setattr(digests, 'QUIET_HOURS', quiet)
+    utc_offset = timedelta(hours=-5)
+    now = datetime(2026, 10, 20, local_hour) - utc_offset
+
+    assert digests.in_quiet_hours(utc_offset, now) is expected
@@ -0,0 +1,25 @@
+import profiling
+
+
+def slow_handler():
+    return 'done'
+
+
+def test_gevent_workers_run_the_handler_without_profiling(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TARGETS', 'slow_handler')
+    monkeypatch.setattr(profiling, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(profiling, 'PROFILE_SLOW_SECONDS', 0)
+    monkeypatch.setattr(profiling, 'green_threads_active', lambda: True)
+
+    assert profiling.profiled(slow_handler)() == 'done'
+    assert profiling.load_profile_index() == []
+
+
+def test_sampled_slow_run_is_saved(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TARGETS', 'slow_handler')
+    monkeypatch.setattr(profiling, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(profiling, 'PROFILE_SLOW_SECONDS', 0)
+    monkeypatch.setattr(profiling, 'green_threads_active', lambda: False)
+
+    assert profiling.profiled(slow_handler)() == 'done'
+    assert [entry['target'] for entry in profiling.load_profile_index()] == ['slow_handler']
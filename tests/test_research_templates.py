@@ -0,0 +1,21 @@
+import json
+
+import pytest
+
+from briefs import BRIEF_TOOL
+from research_templates import TEMPLATES, get_template, system_blocks
+
+# Anthropic's minimum cacheable prefix for Sonnet, and a conservative
+# characters-per-token ratio for English prose
+MIN_CACHE_TOKENS = 1024
+CHARS_PER_TOKEN = 4.5
+
+
+@pytest.mark.parametrize('name', sorted(TEMPLATES))
+def test_template_prefix_is_long_enough_to_cache(name, monkeypatch):
+    monkeypatch.setattr('research_templates.DEFAULT_TEMPLATE', name)
+    blocks = system_blocks(get_template())
+
+    prefix = json.dumps(BRIEF_TOOL) + blocks[0]['text']
+    assert len(prefix) / CHARS_PER_TOKEN >= MIN_CACHE_TOKENS
+    assert blocks[-1]['cache_control'] == {'type': 'ephemeral'}
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from scan_scheduler import MAX_INTERVAL_SECONDS, MIN_INTERVAL_SECONDS, compute_scan_interval, record_scan
+
+NOW = datetime(2026, 10, 20, 12, 0)
+
+
+def event(event_id, start):
+    return {'id': event_id, 'start': {'dateTime': start}}
+
+
+def test_meetings_sliding_through_the_window_are_not_changes():
+    schedule = {}
+    record_scan(schedule, 'U1', [event('a', '2026-10-21T13:00:00Z'), event('b', '2026-10-22T10:00:00Z')], now=NOW)
+
+    # Six hours on, 'a' has left the near edge and 'c' has entered at the far edge
+    later = NOW + timedelta(hours=6)
+    record_scan(schedule, 'U1', [event('b', '2026-10-22T10:00:00Z'), event('c', '2026-10-22T17:00:00Z')], now=later)
+
+    assert schedule['U1']['change_rate'] == 0
+
+
+def test_moved_meeting_inside_both_windows_is_a_change():
+    schedule = {}
+    record_scan(schedule, 'U1', [event('b', '2026-10-22T10:00:00Z')], now=NOW)
+
+    record_scan(schedule, 'U1', [event('b', '2026-10-22T11:00:00Z')], now=NOW + timedelta(hours=1))
+
+    assert schedule['U1']['change_rate'] > 0
+
+
+def test_old_list_fingerprint_counts_as_unchanged():
+    schedule = {'U1': {'fingerprint': ['b@2026-10-22T10:00:00Z'], 'change_rate': 0.0}}
+
+    record_scan(schedule, 'U1', [event('b', '2026-10-22T11:00:00Z')], now=NOW)
+
+    assert schedule['U1']['change_rate'] == 0
+
+
+def test_busy_and_changing_calendars_are_scanned_sooner():
+    idle = compute_scan_interval(0, 0.0, now=NOW)
+    busy = compute_scan_interval(5, 0.0, now=NOW)
+    churning = compute_scan_interval(5, 1.0, now=NOW)
+
+    assert idle == MAX_INTERVAL_SECONDS
+    assert MIN_INTERVAL_SECONDS <= churning < busy < idle
+
+
+def test_scan_wakes_when_the_next_meeting_enters_the_window():
+    entry_at = NOW + timedelta(hours=2)
+
+    assert compute_scan_interval(0, 0.0, entry_at, now=NOW) == 2 * 3600
+    # ...but never sooner than the API budget allows
+    assert compute_scan_interval(0, 0.0, NOW + timedelta(minutes=1), now=NOW) == MIN_INTERVAL_SECONDS
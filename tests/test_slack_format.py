@@ -0,0 +1,44 @@
+from briefs import SECTIONS
+from slack_format import MAX_BLOCKS, render_brief_blocks
+
+
+def brief(company):
+    return {
+        'company': company,
+        'sections': {s['key']: {'content': f"{company} {s['key']}", 'generated_at': '2026-10-20T12:00:00'}
+                     for s in SECTIONS}
+    }
+
+
+def texts(blocks):
+    return [b['text']['text'] if 'text' in b else b['elements'][0]['text'] for b in blocks if b['type'] != 'divider']
+
+
+def test_single_brief_gets_a_block_per_section():
+    blocks = render_brief_blocks([brief('Acme')], 'Research Brief: Acme', footer='Ask me anything')
+
+    assert len(blocks) == 1 + len(SECTIONS) + 2
+    assert texts(blocks)[-1] == 'Ask me anything'
+
+
+def test_many_companies_collapse_to_stay_under_the_block_limit():
+    companies = [brief(f'Company {i}') for i in range(12)]
+
+    blocks = render_brief_blocks(companies, 'Research Brief', summary='They partner', footer='Footer')
+
+    assert len(blocks) <= MAX_BLOCKS
+    # Collapsed: one section block per company, heading included
+    assert sum(1 for t in texts(blocks) if t.startswith('*🏢 ')) == 12
+
+
+def test_companies_that_dont_fit_are_named_and_failures_reported():
+    companies = [brief(f'Company {i}') for i in range(30)]
+
+    blocks = render_brief_blocks(companies, 'Research Brief', footer='Footer', failed=['Globex'])
+
+    assert len(blocks) <= MAX_BLOCKS
+    notes = texts(blocks)[-3:]
+    assert notes[0] == "❌ Couldn't generate research for: Globex"
+    assert notes[1].startswith('Not shown here (see the full text): ')
+    assert 'Company 29' in notes[1]
+    assert notes[2] == 'Footer'